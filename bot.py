@@ -1,58 +1,224 @@
 # main.py
+import time
+# Start of bot.py's own imports; interpreter and uvicorn start-up come before this and are not
+# included. scripts/bench_cold_start.py measures from process spawn to the first webhook ack.
+_import_started = time.perf_counter()
+
 import os
+import secrets
 import datetime
 import asyncio
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
-from telegram import Update, BotCommand
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from telegram import Update, BotCommand, BotCommandScopeChat
 from telegram.ext import ApplicationBuilder
+import httpx
 from handlers.admin import register_schedule_handler
 from handlers.patient import register_patient_handler
+from services.db import ensure_indexes, ping as ping_db
+from services.persistence import MongoPersistence
+from services.update_queue import UpdateQueue
+from services.dedup import UpdateDedup
+from services.scheduler import notifier
+from services.reminders import dispatch_due_reminders
+from services.availability import availability_cache, warm_up as warm_availability
+from services import metrics, stats
+from services.registry import registry
+from services.waitlist import expire_holds
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
-DOCTOR_ID = int(os.getenv("DOCTOR_TELEGRAM_ID"))
+# Optional: seeds the Doctors registry on first start.
+DOCTOR_ID = int(os.getenv("DOCTOR_TELEGRAM_ID", 0)) or None
 PORT = int(os.getenv("PORT", 8000))
+WARMUP_MINUTES = int(os.getenv("WARMUP_MINUTES", 10))
+# Shared secret for GET /stats; the endpoint is disabled when unset.
+STATS_TOKEN = os.getenv("STATS_TOKEN")
+
+persistence = MongoPersistence(
+    update_interval=float(os.getenv("PERSISTENCE_INTERVAL", 5)),
+    shared=os.getenv("PERSISTENCE_SHARED", "false").lower() == "true",
+)
 
 app = FastAPI()
-telegram_app = ApplicationBuilder().token(BOT_TOKEN).build()
+telegram_app = ApplicationBuilder().token(BOT_TOKEN).persistence(persistence).build()
+
+async def process_update(update):
+    async with metrics.trace_update(update):
+        await persistence.refresh(update, telegram_app)
+        await telegram_app.process_update(update)
+        await persistence.write_through(telegram_app)
+
+update_queue = UpdateQueue(
+    process_update,
+    workers=int(os.getenv("UPDATE_WORKERS", 8)),
+    maxsize=int(os.getenv("UPDATE_QUEUE_SIZE", 1000)),
+    dedup=UpdateDedup(
+        maxsize=int(os.getenv("DEDUP_SIZE", 10000)),
+        ttl=int(os.getenv("DEDUP_TTL_SECONDS", 3600)),
+        shared=os.getenv("DEDUP_SHARED", "false").lower() == "true",
+    ),
+)
+
+metrics.register_gauge("webhook_queue_depth", "Updates waiting to be processed.", update_queue.depth)
+metrics.register_gauge("webhook_updates_rejected_total", "Updates refused because the queue was full.",
+                       lambda: update_queue.rejected, "counter")
+metrics.register_gauge("webhook_updates_duplicate_total", "Redelivered updates that were dropped.",
+                       lambda: update_queue.duplicates, "counter")
+last_warm_up = {"mongoMs": None, "at": None}
+metrics.register_gauge("mongo_ping_ms", "MongoDB round-trip time measured by the last warm-up.",
+                       lambda: last_warm_up["mongoMs"] or 0)
+metrics.register_gauge("notifications_pending", "Patient messages waiting to be sent.", notifier.pending)
+metrics.register_gauge("availability_cache_hits_total", "Availability cache hits.",
+                       lambda: availability_cache.hits, "counter")
+metrics.register_gauge("availability_cache_misses_total", "Availability cache misses.",
+                       lambda: availability_cache.misses, "counter")
+metrics.register_gauge("availability_cache_evictions_total", "Availability cache LRU evictions.",
+                       lambda: availability_cache.evictions, "counter")
 
 register_schedule_handler(telegram_app)
-register_patient_handler(telegram_app, DOCTOR_ID)
+register_patient_handler(telegram_app)
+
+DOCTOR_COMMANDS = [
+    BotCommand("schedule", "Set your weekly availability"),
+    BotCommand("template", "Publish a weekly pattern for several weeks"),
+    BotCommand("viewpatients", "View patients by date"),
+    BotCommand("roster", "Export appointments as CSV"),
+    BotCommand("stats", "Slot utilization by week, hospital and session"),
+]
+PATIENT_COMMANDS = [
+    BotCommand("start", "Start appointment booking"),
+    BotCommand("myappointment", "View or cancel appointment"),
+]
+
+async def ensure_commands(commands, scope=None):
+    """Only call set_my_commands when Telegram's stored list differs."""
+    if tuple(await telegram_app.bot.get_my_commands(scope=scope)) != tuple(commands):
+        await telegram_app.bot.set_my_commands(commands, scope=scope)
+
+async def ensure_webhook():
+    url = f"{WEBHOOK_URL}/webhook/{BOT_TOKEN}"
+    if (await telegram_app.bot.get_webhook_info()).url != url:
+        await telegram_app.bot.set_webhook(url=url)
 
 async def set_bot_commands():
-    await telegram_app.bot.set_my_commands(
-        [
-            BotCommand("schedule", "Set your weekly availability"),
-            BotCommand("viewpatients", "View patients by date"),
-        ],
-        scope={"type": "chat", "chat_id": DOCTOR_ID},
-    )
-    await telegram_app.bot.set_my_commands(
-        [
-            BotCommand("start", "Start appointment booking"),
-            BotCommand("myappointment", "View or cancel appointment"),
-        ]
+    await asyncio.gather(
+        ensure_commands(PATIENT_COMMANDS),
+        *(ensure_commands(DOCTOR_COMMANDS, scope=BotCommandScopeChat(doctor_id)) for doctor_id in registry.doctor_ids()),
     )
 
 @app.post(f"/webhook/{BOT_TOKEN}")
 async def webhook(request: Request):
     data = await request.json()
     update = Update.de_json(data, telegram_app.bot)
-    await telegram_app.process_update(update)
+    if update_queue.submit(update) == "full":
+        # Non-2xx makes Telegram retry later instead of us buffering without bound.
+        return JSONResponse({"ok": False}, status_code=503)
     return {"ok": True}
 
-def ping_self():
-    print(f"[{datetime.datetime.now()}] ⏰ Keep-alive ping running...")
+@app.get("/queue")
+async def queue_stats():
+    return update_queue.stats()
+
+@app.get("/stats")
+async def stats_endpoint(start: str = None, end: str = None, doctorId: int = None,
+                         x_stats_token: str = Header(None)):
+    if not STATS_TOKEN:
+        return JSONResponse({"ok": False, "error": "not found"}, status_code=404)
+    if not x_stats_token or not secrets.compare_digest(x_stats_token.encode(), STATS_TOKEN.encode()):
+        return JSONResponse({"ok": False, "error": "unauthorized"}, status_code=401)
+    try:
+        default_start, default_end = stats.default_range()
+        start = datetime.date.fromisoformat(start) if start else default_start
+        end = datetime.date.fromisoformat(end) if end else default_end
+    except ValueError:
+        return JSONResponse({"ok": False, "error": "start and end must be YYYY-MM-DD"}, status_code=400)
+    return {"start": str(start), "end": str(end), "rows": await stats.utilization(start, end, doctorId)}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def slow_traces():
+    return list(metrics.slow_traces)
+
+@app.get("/healthz")
+async def healthz():
+    try:
+        mongo_ms = round(await asyncio.wait_for(ping_db(), timeout=5), 2)
+    except Exception as e:
+        return JSONResponse({"ok": False, "error": f"mongo: {e}"}, status_code=503)
+    return {
+        "ok": True,
+        "mongoMs": mongo_ms,
+        "queueDepth": update_queue.depth(),
+        "cache": availability_cache.stats(),
+        "lastWarmUp": last_warm_up,
+    }
+
+async def warm_up():
+    """Keep the Mongo pool and availability cache hot, and keep the service from idling out."""
+    try:
+        last_warm_up["mongoMs"] = round(await ping_db(), 2)
+        await registry.load()
+        await warm_availability(registry.hospitals())
+        last_warm_up["at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        print(f"[{last_warm_up['at']}] 🔥 Warm-up done, Mongo RTT {last_warm_up['mongoMs']} ms")
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+
+    if WEBHOOK_URL:
+        # A request through the public URL counts as traffic, so the instance is not spun down.
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                await client.get(f"{WEBHOOK_URL}/healthz")
+        except httpx.HTTPError as e:
+            print(f"Keep-alive request failed: {e}")
+
+# asyncio keeps only weak references to tasks; hold the index build until it finishes.
+background_tasks = set()
+
+def index_build_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Index build failed: {task.exception()!r}")
 
 @app.on_event("startup")
 async def on_startup():
-    await telegram_app.initialize()
-    await set_bot_commands()
-    await telegram_app.bot.set_webhook(url=f"{WEBHOOK_URL}/webhook/{BOT_TOKEN}")
+    started = time.perf_counter()
+    # Index builds are idempotent and not needed to answer the first update.
+    index_task = asyncio.create_task(ensure_indexes())
+    background_tasks.add(index_task)
+    index_task.add_done_callback(index_build_done)
+    await asyncio.gather(telegram_app.initialize(), registry.load(bootstrap_doctor_id=DOCTOR_ID))
+    initialized = time.perf_counter()
+    await asyncio.gather(set_bot_commands(), ensure_webhook())
+    configured = time.perf_counter()
     await telegram_app.start()
+    update_queue.start()
+    notifier.start(telegram_app.bot)
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(ping_self, 'interval', minutes=15)
+    scheduler.add_job(warm_up, 'interval', minutes=WARMUP_MINUTES, max_instances=1, coalesce=True,
+                      next_run_time=datetime.datetime.now())
+    scheduler.add_job(dispatch_due_reminders, 'interval', minutes=1, max_instances=1, coalesce=True)
+    scheduler.add_job(expire_holds, 'interval', minutes=1, max_instances=1, coalesce=True)
     scheduler.start()
+    ready = time.perf_counter()
+    print(
+        f"🚀 Startup since bot.py import: imports {(started - _import_started) * 1000:.0f} ms, "
+        f"initialize {(initialized - started) * 1000:.0f} ms, "
+        f"commands+webhook {(configured - initialized) * 1000:.0f} ms, "
+        f"start {(ready - configured) * 1000:.0f} ms, "
+        f"total {(ready - _import_started) * 1000:.0f} ms"
+    )
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await update_queue.stop()
+    await notifier.stop()
+    await telegram_app.stop()
+    await telegram_app.shutdown()
@@ -7,17 +7,32 @@ from telegram.ext import (
     filters,
 )
 import datetime
-from services.db import doctor_availability
-import os
-
-DOCTOR_ID = int(os.getenv("DOCTOR_TELEGRAM_ID"))
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from services.db import doctor_availability, appointments
+from services import availability
+from services.scheduler import notifier
+from services.reminders import cancel_reminders
+from services.roster import export_roster_csv, patient_details
+from services.registry import registry
+from services import waitlist, stats
+from services.metrics import timed
+from handlers.common import is_doctor
+from handlers.validation import DAYS, SESSIONS, normalize_day, day_index, normalize_session, normalize_hospital
 
 # States
 HOSPITAL, DAY, SESSION, CONFIRM_OVERWRITE, VIEW_DAY = range(5)
+TEMPLATE_PATTERN, TEMPLATE_WEEKS = range(5, 7)
+
+SLOTS_PER_SESSION = 10
+MAX_TEMPLATE_WEEKS = 12
+MAX_MESSAGE_LENGTH = 4096
+
 
-HOSPITALS = ["Abet Hospital", "Ethio Tebib Hospital", "Girum Hospital"]
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-SESSIONS = ["Morning", "Afternoon", "Both"]
+def next_date(day):
+    """The next date (today included) falling on `day`."""
+    today = datetime.date.today()
+    return today + datetime.timedelta(days=(day_index(day) - today.weekday()) % 7)
 
 
 def generate_slots(start_time, end_time, count=10):
@@ -31,35 +46,71 @@ def generate_slots(start_time, end_time, count=10):
     ]
 
 
+def build_sessions(selected_date, session_choice):
+    session_data = {}
+
+    if session_choice in ["Morning", "Both"]:
+        start = datetime.datetime.combine(selected_date, datetime.time(8, 30))
+        end = datetime.datetime.combine(selected_date, datetime.time(12, 0))
+        session_data["morning"] = {
+            "startTime": "08:30",
+            "endTime": "12:00",
+            "availableCount": SLOTS_PER_SESSION,
+            "slots": generate_slots(start, end, SLOTS_PER_SESSION)
+        }
+
+    if session_choice in ["Afternoon", "Both"]:
+        start = datetime.datetime.combine(selected_date, datetime.time(14, 0))
+        end = datetime.datetime.combine(selected_date, datetime.time(17, 0))
+        session_data["afternoon"] = {
+            "startTime": "14:00",
+            "endTime": "17:00",
+            "availableCount": SLOTS_PER_SESSION,
+            "slots": generate_slots(start, end, SLOTS_PER_SESSION)
+        }
+
+    return session_data
+
+
 # ==================== Schedule Flow ====================
 
+@timed
 async def schedule_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.effective_user.id != DOCTOR_ID:
+    if not is_doctor(update, context):
         await update.message.reply_text("You are not authorized.")
         return ConversationHandler.END
 
-    await update.message.reply_text("Choose a hospital:", reply_markup=ReplyKeyboardMarkup([[h] for h in HOSPITALS], one_time_keyboard=True))
+    await update.message.reply_text("Choose a hospital:", reply_markup=ReplyKeyboardMarkup([[h] for h in registry.hospitals(update.effective_user.id)], one_time_keyboard=True))
     return HOSPITAL
 
 
+@timed
 async def select_hospital(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["hospital"] = update.message.text
+    hospital = normalize_hospital(update.message.text, update.effective_user.id)
+    if not hospital:
+        await update.message.reply_text(
+            "❌ Please choose one of your hospitals:",
+            reply_markup=ReplyKeyboardMarkup([[h] for h in registry.hospitals(update.effective_user.id)], one_time_keyboard=True)
+        )
+        return HOSPITAL
+    context.user_data["hospital"] = hospital
     await update.message.reply_text("Select a day:", reply_markup=ReplyKeyboardMarkup([[d] for d in DAYS], one_time_keyboard=True))
     return DAY
 
 
+@timed
 async def select_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    day = update.message.text
+    day = normalize_day(update.message.text)
+    if not day:
+        await update.message.reply_text("❌ Please select a day from the list.",
+                                        reply_markup=ReplyKeyboardMarkup([[d] for d in DAYS], one_time_keyboard=True))
+        return DAY
     context.user_data["day"] = day
 
-    weekday_to_date = {
-        name: (datetime.datetime.now() + datetime.timedelta(days=(i - datetime.datetime.now().weekday()) % 7)).date()
-        for i, name in enumerate(DAYS)
-    }
-    selected_date = weekday_to_date[day]
+    selected_date = next_date(day)
     context.user_data["selected_date"] = selected_date
 
-    existing = doctor_availability.find_one({"date": str(selected_date)})
+    existing = await doctor_availability.find_one({"doctorId": update.effective_user.id, "date": str(selected_date)})
     if existing:
         context.user_data["existing_schedule"] = existing
         await update.message.reply_text(
@@ -73,6 +124,7 @@ async def select_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return SESSION
 
 
+@timed
 async def confirm_overwrite(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text.lower() != "yes":
         await update.message.reply_text("❌ Schedule unchanged.")
@@ -81,64 +133,156 @@ async def confirm_overwrite(update: Update, context: ContextTypes.DEFAULT_TYPE):
     existing = context.user_data["existing_schedule"]
     selected_date = context.user_data["selected_date"]
 
-    for session in ["morning", "afternoon"]:
-        for slot in existing.get("sessions", {}).get(session, {}).get("slots", []):
-            patient_id = slot.get("patientId")
-            if patient_id:
-                try:
-                    await context.bot.send_message(
-                        chat_id=patient_id,
-                        text=f"⚠️ Your appointment on {selected_date} at {existing['hospital']} was cancelled. Please rebook."
-                    )
-                except Exception as e:
-                    print(f"Notification failed: {e}")
-
-    doctor_availability.delete_one({"_id": existing["_id"]})
+    async for appt in appointments.find({"scheduleId": existing["_id"]}, {"patientId": 1}):
+        notifier.notify(
+            appt["patientId"],
+            f"⚠️ Your appointment on {selected_date} at {existing['hospital']} was cancelled. Please rebook."
+        )
+
+    await doctor_availability.delete_one({"_id": existing["_id"]})
+    await appointments.delete_many({"scheduleId": existing["_id"]})
+    await cancel_reminders(schedule_id=existing["_id"])
+    await stats.remove_schedule(existing.get("doctorId"), existing["date"])
+    availability.invalidate(existing["hospital"], existing["date"])
     await update.message.reply_text("🗑️ Old schedule deleted. Now select session:",
                                     reply_markup=ReplyKeyboardMarkup([[s] for s in SESSIONS], one_time_keyboard=True))
     return SESSION
 
 
+@timed
 async def select_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     hospital = context.user_data["hospital"]
     selected_date = context.user_data["selected_date"]
-    session_choice = update.message.text
+    session_choice = normalize_session(update.message.text)
+    if not session_choice:
+        await update.message.reply_text("❌ Please select a session from the list.",
+                                        reply_markup=ReplyKeyboardMarkup([[s] for s in SESSIONS], one_time_keyboard=True))
+        return SESSION
     day = context.user_data["day"]
 
-    session_data = {}
+    sessions = build_sessions(selected_date, session_choice)
+    try:
+        result = await doctor_availability.insert_one({
+            "doctorId": update.effective_user.id,
+            "hospital": hospital,
+            "date": str(selected_date),
+            "sessions": sessions
+        })
+    except DuplicateKeyError:
+        await update.message.reply_text(f"⚠️ {day} ({selected_date}) was scheduled in the meantime. Use /schedule to review it.")
+        return ConversationHandler.END
+    availability.invalidate(hospital, str(selected_date))
+    await stats.record_schedule(update.effective_user.id, hospital, str(selected_date), sessions)
+    await waitlist.offer_freed_slots(result.inserted_id)
 
-    if session_choice in ["Morning", "Both"]:
-        start = datetime.datetime.combine(selected_date, datetime.time(8, 30))
-        end = datetime.datetime.combine(selected_date, datetime.time(12, 0))
-        session_data["morning"] = {
-            "startTime": "08:30",
-            "endTime": "12:00",
-            "slots": generate_slots(start, end, 10)
-        }
+    await update.message.reply_text(f"✅ Schedule set for {hospital} on {day} ({selected_date}).")
+    return ConversationHandler.END
 
-    if session_choice in ["Afternoon", "Both"]:
-        start = datetime.datetime.combine(selected_date, datetime.time(14, 0))
-        end = datetime.datetime.combine(selected_date, datetime.time(17, 0))
-        session_data["afternoon"] = {
-            "startTime": "14:00",
-            "endTime": "17:00",
-            "slots": generate_slots(start, end, 10)
-        }
 
-    doctor_availability.insert_one({
-        "hospital": hospital,
-        "date": str(selected_date),
-        "sessions": session_data
-    })
+# ==================== Template Flow ====================
 
-    await update.message.reply_text(f"✅ Schedule set for {hospital} on {day} ({selected_date}).")
+@timed
+async def template_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_doctor(update, context):
+        await update.message.reply_text("You are not authorized.")
+        return ConversationHandler.END
+
+    hospitals = registry.hospitals(update.effective_user.id) or ["Hospital"]
+    await update.message.reply_text(
+        "🗓️ Send your weekly pattern, one line per day:\n"
+        "Hospital, Day, Session\n\n"
+        "For example:\n"
+        f"{hospitals[0]}, Monday, Morning\n"
+        f"{hospitals[-1]}, Wednesday, Both"
+    )
+    return TEMPLATE_PATTERN
+
+
+def parse_template(text, allowed_hospitals):
+    """Parse "Hospital, Day, Session" lines into [(hospital, day index, session)]."""
+    hospitals = {" ".join(h.split()).lower(): h for h in allowed_hospitals}
+
+    pattern = []
+    for line in filter(None, (l.strip() for l in text.splitlines())):
+        parts = line.split(",")
+        if len(parts) != 3:
+            raise ValueError(f"Could not understand: {line}")
+        hospital = hospitals.get(" ".join(parts[0].split()).lower())
+        day, session = normalize_day(parts[1]), normalize_session(parts[2])
+        if not hospital or not day or not session:
+            raise ValueError(f"Could not understand: {line}")
+        if any(d == day_index(day) for _, d, _ in pattern):
+            raise ValueError(f"{day} appears more than once.")
+        pattern.append((hospital, day_index(day), session))
+
+    if not pattern:
+        raise ValueError("The pattern is empty.")
+    return pattern
+
+
+@timed
+async def select_template(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data["template"] = parse_template(update.message.text, registry.hospitals(update.effective_user.id))
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\nPlease send the pattern again or /cancel.")
+        return TEMPLATE_PATTERN
+
+    await update.message.reply_text(
+        "For how many weeks should this pattern repeat?",
+        reply_markup=ReplyKeyboardMarkup([["1", "2", "4", "8"]], one_time_keyboard=True)
+    )
+    return TEMPLATE_WEEKS
+
+
+@timed
+async def apply_template(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    if not text.isdigit() or not 1 <= int(text) <= MAX_TEMPLATE_WEEKS:
+        await update.message.reply_text(f"❌ Please enter a number of weeks between 1 and {MAX_TEMPLATE_WEEKS}.")
+        return TEMPLATE_WEEKS
+
+    doctor_id = update.effective_user.id
+    today = datetime.date.today()
+    ops, keys = [], []
+    for week in range(int(text)):
+        for hospital, day_index, session_choice in context.user_data["template"]:
+            date = today + datetime.timedelta(days=(day_index - today.weekday()) % 7 + 7 * week)
+            # Upsert with $setOnInsert so dates that already have a schedule are left untouched.
+            sessions = build_sessions(date, session_choice)
+            ops.append(UpdateOne({"doctorId": doctor_id, "date": str(date)}, {"$setOnInsert": {
+                "hospital": hospital,
+                "date": str(date),
+                "sessions": sessions,
+            }}, upsert=True))
+            keys.append((hospital, str(date), sessions))
+
+    try:
+        upserted = (await doctor_availability.bulk_write(ops, ordered=False)).upserted_ids
+    except BulkWriteError as e:
+        # Dates a concurrent /schedule or /template created first are skipped like existing ones.
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        upserted = {u["index"]: u["_id"] for u in e.details["upserted"]}
+    for index, schedule_id in upserted.items():
+        hospital, date, sessions = keys[index]
+        availability.invalidate(hospital, date)
+        await stats.record_schedule(doctor_id, hospital, date, sessions)
+        await waitlist.offer_freed_slots(schedule_id)
+
+    created = len(upserted)
+    await update.message.reply_text(
+        f"✅ Created {created} schedule(s) over {text} week(s)."
+        + (f"\n↩️ Skipped {len(ops) - created} date(s) that were already scheduled." if len(ops) > created else "")
+    )
     return ConversationHandler.END
 
 
 # ==================== View Patients Flow ====================
 
+@timed
 async def view_patients_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.effective_user.id != DOCTOR_ID:
+    if not is_doctor(update, context):
         await update.message.reply_text("Not authorized.")
         return
 
@@ -146,46 +290,150 @@ async def view_patients_handler(update: Update, context: ContextTypes.DEFAULT_TY
     return VIEW_DAY
 
 
+@timed
 async def view_patients_by_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    day = update.message.text
-    try:
-        i = DAYS.index(day)
-    except ValueError:
+    day = normalize_day(update.message.text)
+    if not day:
         await update.message.reply_text("Invalid day. Please select from the list.")
         return VIEW_DAY
 
-    selected_date = (datetime.datetime.now() + datetime.timedelta(days=(i - datetime.datetime.now().weekday()) % 7)).date()
+    selected_date = next_date(day)
 
-    schedule = doctor_availability.find_one({"date": str(selected_date)})
-    if not schedule:
+    schedules = await doctor_availability.find({
+        "doctorId": update.effective_user.id, "date": str(selected_date)
+    }).sort("hospital").to_list(length=None)
+    if not schedules:
         await update.message.reply_text("No schedule found for that date.")
         return ConversationHandler.END
 
-    response = f"📅 Appointments for {selected_date} at {schedule['hospital']}:\n"
-    found = False
-    for session_name, session in schedule.get("sessions", {}).items():
-        response += f"\n🕓 {session_name.capitalize()} Session:\n"
-        for slot in session["slots"]:
-            if slot.get("patientId"):
-                info = slot.get("patientInfo", {})
-                response += f"• {slot['time']}: {info.get('name')} ({info.get('phone')})\n"
-                found = True
-
-    if not found:
-        response += "No patients booked."
-    await update.message.reply_text(response)
+    booked = await appointments.find(
+        {"scheduleId": {"$in": [schedule["_id"] for schedule in schedules]}},
+        {"scheduleId": 1, "session": 1, "time": 1, "patientId": 1, "patient": 1},
+    ).to_list(length=None)
+    info_by_slot = {
+        (appt["scheduleId"], appt["session"], appt["time"]): info
+        for appt, info in zip(booked, await patient_details(booked))
+    }
+
+    lines = []
+    for schedule in schedules:
+        lines.append(f"📅 Appointments for {selected_date} at {schedule['hospital']}:")
+        for session_name, session in schedule.get("sessions", {}).items():
+            lines.append(f"\n🕓 {session_name.capitalize()} Session:")
+            for slot in session["slots"]:
+                if slot.get("patientId"):
+                    info = info_by_slot.get((schedule["_id"], session_name, slot["time"]), {})
+                    lines.append(f"• {slot['time']}: {info.get('name')} ({info.get('phone')})")
+        lines.append("")
+
+    if not booked:
+        lines.append("No patients booked.")
+    for chunk in chunk_lines(lines, MAX_MESSAGE_LENGTH):
+        await update.message.reply_text(chunk)
     return ConversationHandler.END
 
 
+def chunk_lines(lines, limit):
+    """Join lines into messages no longer than `limit` characters."""
+    chunk, size = [], 0
+    for line in lines:
+        if chunk and size + len(line) + 1 > limit:
+            yield "\n".join(chunk)
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield "\n".join(chunk)
+
+
+# ==================== Roster Export ====================
+
+async def date_range_args(update, context, command, default):
+    """(start, end) from up to two YYYY-MM-DD arguments, or None after telling the user what was wrong.
+
+    One date covers the week starting on it; no dates gives `default`.
+    """
+    try:
+        dates = [datetime.datetime.strptime(arg, "%Y-%m-%d").date() for arg in context.args[:2]]
+    except ValueError:
+        await update.message.reply_text(f"Usage: /{command} [YYYY-MM-DD] [YYYY-MM-DD]")
+        return None
+    start, end = default
+    if dates:
+        start = dates[0]
+        end = dates[1] if len(dates) > 1 else start + datetime.timedelta(days=6)
+    if end < start:
+        await update.message.reply_text("❌ The end date must not be before the start date.")
+        return None
+    return start, end
+
+
+@timed
+async def roster_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/roster [start] [end] — CSV of all appointments in a date range (default: next 7 days)."""
+    if not is_doctor(update, context):
+        await update.message.reply_text("Not authorized.")
+        return
+
+    today = datetime.date.today()
+    date_range = await date_range_args(update, context, "roster", (today, today + datetime.timedelta(days=6)))
+    if not date_range:
+        return
+    start, end = date_range
+
+    roster, rows = await export_roster_csv(update.effective_user.id, start, end)
+    with roster:
+        await update.message.reply_document(
+            document=roster,
+            filename=f"roster_{start}_{end}.csv",
+            caption=f"📋 {rows} appointment(s) from {start} to {end}.",
+        )
+
+
+@timed
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Cancelled.")
     return ConversationHandler.END
 
 
+# ==================== Utilization Stats ====================
+
+@timed
+async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats [start] [end] — booked/total slots per week, hospital and session (default: next 4 weeks)."""
+    if not is_doctor(update, context):
+        await update.message.reply_text("Not authorized.")
+        return
+
+    date_range = await date_range_args(update, context, "stats", stats.default_range())
+    if not date_range:
+        return
+    start, end = date_range
+
+    rows = await stats.utilization(start, end, update.effective_user.id)
+    if not rows:
+        await update.message.reply_text(f"No schedules between {start} and {end}.")
+        return
+
+    lines, week = [f"📊 Utilization from {start} to {end}"], None
+    for row in rows:
+        if row["week"] != week:
+            week = row["week"]
+            lines.append(f"\n📅 Week of {week}")
+        percent = row["booked"] * 100 // row["total"] if row["total"] else 0
+        lines.append(f"🏥 {row['hospital']} – {row['session'].capitalize()}: {row['booked']}/{row['total']} ({percent}%)")
+    booked, total = sum(r["booked"] for r in rows), sum(r["total"] for r in rows)
+    lines.append(f"\nTotal: {booked}/{total} slots booked" + (f" ({booked * 100 // total}%)" if total else ""))
+    for chunk in chunk_lines(lines, MAX_MESSAGE_LENGTH):
+        await update.message.reply_text(chunk)
+
+
 # ==================== Register Handlers ====================
 
 def register_schedule_handler(app):
     schedule_conv = ConversationHandler(
+        name="schedule",
+        persistent=True,
         entry_points=[CommandHandler("schedule", schedule_handler)],
         states={
             HOSPITAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_hospital)],
@@ -196,7 +444,20 @@ def register_schedule_handler(app):
         fallbacks=[CommandHandler("cancel", cancel)],
     )
 
+    template_conv = ConversationHandler(
+        name="template",
+        persistent=True,
+        entry_points=[CommandHandler("template", template_handler)],
+        states={
+            TEMPLATE_PATTERN: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_template)],
+            TEMPLATE_WEEKS: [MessageHandler(filters.TEXT & ~filters.COMMAND, apply_template)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+
     view_conv = ConversationHandler(
+        name="view_patients",
+        persistent=True,
         entry_points=[CommandHandler("viewpatients", view_patients_handler)],
         states={
             VIEW_DAY: [MessageHandler(filters.TEXT & ~filters.COMMAND, view_patients_by_day)],
@@ -205,4 +466,7 @@ def register_schedule_handler(app):
     )
 
     app.add_handler(schedule_conv)
+    app.add_handler(template_conv)
     app.add_handler(view_conv)
+    app.add_handler(CommandHandler("roster", roster_handler))
+    app.add_handler(CommandHandler("stats", stats_handler))
@@ -1,5 +1,34 @@
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from services.registry import registry
+
+def is_doctor(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return registry.is_doctor(update.effective_user.id)
+
 
 async def cancel_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("❌ Process cancelled. You can type /start to begin again.")
+
+
+PAGE_SIZE = 4
+
+
+def paged_keyboard(labels, prefix, page=0, page_size=PAGE_SIZE):
+    """Inline keyboard for one page of `labels`.
+
+    Item buttons carry "<prefix>:<index>" and the navigation buttons
+    "<prefix>p:<page>", keeping callback_data far below Telegram's 64-byte cap.
+    """
+    start = page * page_size
+    rows = [
+        [InlineKeyboardButton(label, callback_data=f"{prefix}:{i}")]
+        for i, label in enumerate(labels[start:start + page_size], start)
+    ]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"{prefix}p:{page - 1}"))
+    if start + page_size < len(labels):
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"{prefix}p:{page + 1}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup(rows)
@@ -1,12 +1,21 @@
-from telegram import Update, ReplyKeyboardMarkup
+from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
     CommandHandler,
+    CallbackQueryHandler,
     MessageHandler,
     filters,
 )
-from services.db import doctor_availability
+from handlers.common import paged_keyboard, is_doctor
+from handlers.validation import (
+    SEXES, normalize_text, normalize_age, normalize_sex, normalize_phone, normalize_hospital,
+)
+from services.availability import week_availability, day_availability
+from services.booking import book_slot, release_slot, find_week_appointment, upcoming_appointments
+from services import waitlist
+from services.metrics import timed
+from services.registry import registry
 import datetime
 
 # Conversation states
@@ -14,222 +23,283 @@ NAME, AGE, SEX, REASON, PHONE, HOSPITAL = range(6)
 SELECT_DAY, SELECT_SESSION = range(101, 103)
 CONFIRM_CANCEL = 200
 
-HOSPITALS = ["Abet Hospital", "Ethio Tebib Hospital", "Girum Hospital"]
-SEX_OPTIONS = [["Male", "Female", "Other"]]
+SEX_OPTIONS = [SEXES]
 
 
 # -------------------- BOOKING FLOW --------------------
 
+@timed
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
-    if update.effective_user.id == int(context.bot_data.get("doctor_id", 0)):
+    if is_doctor(update, context):
         await update.message.reply_text("Welcome, Doctor. Use /schedule to set your availability.")
         return ConversationHandler.END
     await update.message.reply_text("Welcome! Let's book your appointment.\nWhat is your full name?")
     return NAME
 
 
+@timed
 async def collect_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["name"] = update.message.text
+    name = normalize_text(update.message.text)
+    if not name:
+        await update.message.reply_text("❌ Please enter your full name.")
+        return NAME
+    context.user_data["name"] = name
     await update.message.reply_text("How old are you?")
     return AGE
 
 
+@timed
 async def collect_age(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["age"] = update.message.text
+    age = normalize_age(update.message.text)
+    if age is None:
+        await update.message.reply_text("❌ Please enter your age as a number, e.g. 34.")
+        return AGE
+    context.user_data["age"] = age
     await update.message.reply_text("What is your sex?", reply_markup=ReplyKeyboardMarkup(SEX_OPTIONS, one_time_keyboard=True))
     return SEX
 
 
+@timed
 async def collect_sex(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["sex"] = update.message.text
+    sex = normalize_sex(update.message.text)
+    if not sex:
+        await update.message.reply_text("❌ Please choose one of the options.",
+                                        reply_markup=ReplyKeyboardMarkup(SEX_OPTIONS, one_time_keyboard=True))
+        return SEX
+    context.user_data["sex"] = sex
     await update.message.reply_text("Briefly describe the reason for your consultation:")
     return REASON
 
 
+@timed
 async def collect_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["reason"] = update.message.text
+    reason = normalize_text(update.message.text)
+    if not reason:
+        await update.message.reply_text("❌ Please describe the reason in a few words.")
+        return REASON
+    context.user_data["reason"] = reason
     await update.message.reply_text("Enter your phone number:")
     return PHONE
 
 
+@timed
 async def collect_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["phone"] = update.message.text
+    phone = normalize_phone(update.message.text)
+    if not phone:
+        await update.message.reply_text("❌ That doesn't look like a phone number. Please enter it like 0911234567.")
+        return PHONE
+    context.user_data["phone"] = phone
     await update.message.reply_text(
         "Choose your preferred hospital:",
-        reply_markup=ReplyKeyboardMarkup([[h] for h in HOSPITALS], one_time_keyboard=True)
+        reply_markup=ReplyKeyboardMarkup([[h] for h in registry.hospitals()], one_time_keyboard=True)
     )
     return HOSPITAL
 
 
-async def collect_hospital(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    selected_hospital = update.message.text
-    context.user_data["hospital"] = selected_hospital
-    today = datetime.date.today()
+def day_labels(available_days):
+    # Only name the doctor when more than one has days on offer at this hospital.
+    show_doctor = len({doctor_id for _, doctor_id, _ in available_days}) > 1
+    return [
+        f"{date.strftime('%A')} ({date.strftime('%Y-%m-%d')})"
+        + (f" – {registry.doctor_name(doctor_id)}" if show_doctor else "")
+        for date, doctor_id, _ in available_days
+    ]
 
-    available_days = []
-    day_options = []
 
-    for offset in range(7):
-        date = today + datetime.timedelta(days=offset)
-        schedule = doctor_availability.find_one({"hospital": selected_hospital, "date": str(date)})
+def appointment_labels(appointments):
+    return [f"{appt['hospital']} - {appt['date']} - {appt['slot_time']} ({appt['session']})" for appt in appointments]
 
-        if schedule:
-            sessions = []
-            for session_name, session in schedule.get("sessions", {}).items():
-                if any(slot["available"] for slot in session["slots"]):
-                    sessions.append(session_name)
-            if sessions:
-                available_days.append((date, sessions))
-                day_name = date.strftime("%A")  # e.g., Monday
-                formatted = f"{day_name} ({date.strftime('%Y-%m-%d')})"
-                day_options.append([formatted])
+
+@timed
+async def collect_hospital(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    selected_hospital = normalize_hospital(update.message.text)
+    if not selected_hospital:
+        await update.message.reply_text(
+            "❌ Please choose a hospital from the list:",
+            reply_markup=ReplyKeyboardMarkup([[h] for h in registry.hospitals()], one_time_keyboard=True)
+        )
+        return HOSPITAL
+    context.user_data["hospital"] = selected_hospital
+    available_days = await week_availability(selected_hospital)
 
     if not available_days:
         await update.message.reply_text(
             "❌ No available slots for this hospital this week.\nPlease choose another hospital:",
-            reply_markup=ReplyKeyboardMarkup([[h] for h in HOSPITALS], one_time_keyboard=True)
+            reply_markup=ReplyKeyboardMarkup([[h] for h in registry.hospitals()], one_time_keyboard=True)
+        )
+        await update.message.reply_text(
+            f"…or get notified as soon as a slot opens at {selected_hospital}:",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔔 Join the waitlist", callback_data="w:join")]])
         )
         return HOSPITAL  # Stay in the same step
 
     context.user_data["available_days"] = available_days
     await update.message.reply_text("📅 Available days this week:\nChoose a date:",
-                                    reply_markup=ReplyKeyboardMarkup(day_options, one_time_keyboard=True))
+                                    reply_markup=paged_keyboard(day_labels(available_days), "d"))
     return SELECT_DAY
 
 
+@timed
+async def join_waitlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    user_id = update.effective_user.id
+    hospital = context.user_data["hospital"]
+    today = datetime.date.today()
+
+    await waitlist.join(user_id, hospital, today, today + datetime.timedelta(days=6), {
+        key: context.user_data[key] for key in ("name", "age", "sex", "reason", "phone")
+    })
+    await query.edit_message_text(
+        f"🔔 You're on the waitlist for {hospital}.\nWe'll message you when a slot opens this week."
+    )
+    return ConversationHandler.END
+
+
+@timed
 async def select_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Extract actual date from message, e.g., from "Monday (2025-05-05)" → "2025-05-05"
-    raw_text = update.message.text
-    try:
-        chosen_date = raw_text.split("(")[-1].strip(")")
-    except Exception:
-        await update.message.reply_text("❌ Please select a valid date from the list.")
+    query = update.callback_query
+    await query.answer()
+    action, value = query.data.split(":")
+    available_days = context.user_data.get("available_days", [])
+
+    if action == "dp":
+        await query.edit_message_reply_markup(paged_keyboard(day_labels(available_days), "d", int(value)))
         return SELECT_DAY
 
+    if int(value) >= len(available_days):
+        await query.edit_message_text("⌛ This list has expired. Please type /start to begin again.")
+        return ConversationHandler.END
+
+    date, doctor_id, _ = available_days[int(value)]
+    chosen_date = str(date)
     context.user_data["chosen_date"] = chosen_date
+    context.user_data["doctor_id"] = doctor_id
 
-    for date, sessions in context.user_data.get("available_days", []):
-        if str(date) == chosen_date:
-            context.user_data["available_sessions"] = sessions
-            break
-    else:
-        await update.message.reply_text("❌ No sessions found for that day. Please try again.")
+    sessions = await day_availability(context.user_data["hospital"], chosen_date, doctor_id)
+    if not sessions:
+        await query.edit_message_text("❌ That day has just filled up. Please choose another date:",
+                                      reply_markup=paged_keyboard(day_labels(available_days), "d"))
         return SELECT_DAY
+    context.user_data["available_sessions"] = sessions
 
-    session_buttons = [[s.capitalize()] for s in context.user_data["available_sessions"]]
-    await update.message.reply_text(
-        "🕓 Which session would you prefer?",
-        reply_markup=ReplyKeyboardMarkup(session_buttons, one_time_keyboard=True)
+    await query.edit_message_text(
+        f"📅 {chosen_date}\n🕓 Which session would you prefer?",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(s.capitalize(), callback_data=f"s:{s}")] for s in sessions])
     )
     return SELECT_SESSION
 
 
-
+@timed
 async def select_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    session_choice = update.message.text.lower()
+    query = update.callback_query
+    await query.answer()
+    session_choice = query.data.split(":")[1]
+    if session_choice not in context.user_data.get("available_sessions", ()):
+        await query.edit_message_text("⌛ This list has expired. Please type /start to begin again.")
+        return ConversationHandler.END
     hospital = context.user_data["hospital"]
     chosen_date = context.user_data["chosen_date"]
     user_id = update.effective_user.id
 
     # Prevent duplicate appointment in same week
     selected_date = datetime.datetime.strptime(chosen_date, "%Y-%m-%d").date()
-    week_start = selected_date - datetime.timedelta(days=selected_date.weekday())
-    week_end = week_start + datetime.timedelta(days=6)
+    if await find_week_appointment(user_id, selected_date):
+        await query.edit_message_text("⚠️ You already have an appointment this week. Please cancel it first or wait until next week.")
+        return ConversationHandler.END
 
-    existing = doctor_availability.find({
-        "date": {"$gte": str(week_start), "$lte": str(week_end)}
+    slot_time = await book_slot(context.user_data["doctor_id"], hospital, chosen_date, session_choice, user_id, {
+        "name": context.user_data["name"],
+        "age": context.user_data["age"],
+        "sex": context.user_data["sex"],
+        "reason": context.user_data["reason"],
+        "phone": context.user_data["phone"],
     })
 
-    for doc in existing:
-        for session in doc.get("sessions", {}).values():
-            for slot in session["slots"]:
-                if slot.get("patientId") == user_id:
-                    await update.message.reply_text("⚠️ You already have an appointment this week. Please cancel it first or wait until next week.")
-                    return ConversationHandler.END
-
-    schedule = doctor_availability.find_one({"hospital": hospital, "date": chosen_date})
-    session = schedule["sessions"][session_choice]
-
-    for slot in session["slots"]:
-        if slot["available"]:
-            slot["available"] = False
-            slot["patientId"] = user_id
-            slot["patientInfo"] = {
-                "name": context.user_data["name"],
-                "age": context.user_data["age"],
-                "sex": context.user_data["sex"],
-                "reason": context.user_data["reason"],
-                "phone": context.user_data["phone"],
-            }
-
-            doctor_availability.update_one(
-                {"_id": schedule["_id"]},
-                {"$set": {f"sessions.{session_choice}.slots": session["slots"]}}
-            )
-
-            await update.message.reply_text(
-                f"✅ Appointment booked!\n🏥 {hospital}\n📅 {chosen_date}\n🕓 {slot['time']}"
-            )
-            return ConversationHandler.END
-
-    await update.message.reply_text("⚠️ Sorry, that session just filled up.")
+    if slot_time:
+        await query.edit_message_text(
+            f"✅ Appointment booked!\n🏥 {hospital}\n📅 {chosen_date}\n🕓 {slot_time}"
+        )
+        return ConversationHandler.END
+
+    await query.edit_message_text("⚠️ Sorry, that session just filled up.")
     return ConversationHandler.END
 
+@timed
 async def my_appointment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    today = datetime.date.today()
-    appointments = []
-
-    for doc in doctor_availability.find({"date": {"$gte": str(today)}}).sort("date"):
-        for session_name, session in doc.get("sessions", {}).items():
-            for slot in session["slots"]:
-                if slot.get("patientId") == user_id:
-                    appointments.append({
-                        "schedule_id": doc["_id"],
-                        "session": session_name,
-                        "slot_time": slot["time"],
-                        "hospital": doc["hospital"],
-                        "date": doc["date"]
-                    })
+    appointments = [
+        {
+            "schedule_id": appt["scheduleId"],
+            "session": appt["session"],
+            "slot_time": appt["time"],
+            "hospital": appt["hospital"],
+            "date": appt["date"]
+        } for appt in await upcoming_appointments(user_id)
+    ]
 
     if not appointments:
         await update.message.reply_text("🔎 You don’t have any upcoming appointments.")
         return ConversationHandler.END
 
     context.user_data["appointments"] = appointments
-    buttons = [[f"{i+1}. {appt['hospital']} - {appt['date']} - {appt['slot_time']} ({appt['session']})"]
-               for i, appt in enumerate(appointments)]
-    await update.message.reply_text("📋 Your appointments:\nChoose one to cancel:", reply_markup=ReplyKeyboardMarkup(buttons, one_time_keyboard=True))
+    await update.message.reply_text("📋 Your appointments:\nChoose one to cancel:",
+                                    reply_markup=paged_keyboard(appointment_labels(appointments), "a"))
     return CONFIRM_CANCEL
 
 
+@timed
 async def confirm_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        idx = int(update.message.text.split(".")[0]) - 1
-        appt = context.user_data["appointments"][idx]
-    except:
-        await update.message.reply_text("❌ Invalid selection.")
+    query = update.callback_query
+    await query.answer()
+    action, value = query.data.split(":")
+    appointments = context.user_data.get("appointments", [])
+
+    if action == "ap":
+        await query.edit_message_reply_markup(paged_keyboard(appointment_labels(appointments), "a", int(value)))
+        return CONFIRM_CANCEL
+
+    if int(value) >= len(appointments):
+        await query.edit_message_text("⌛ This list has expired. Please use /myappointment again.")
         return ConversationHandler.END
 
-    schedule = doctor_availability.find_one({"_id": appt["schedule_id"]})
-    if schedule:
-        slots = schedule["sessions"][appt["session"]]["slots"]
-        for slot in slots:
-            if slot["time"] == appt["slot_time"] and slot.get("patientId") == update.effective_user.id:
-                slot["available"] = True
-                slot["patientId"] = None
-                slot["patientInfo"] = None
-
-        doctor_availability.update_one(
-            {"_id": schedule["_id"]},
-            {"$set": {f"sessions.{appt['session']}.slots": slots}}
-        )
+    appt = appointments[int(value)]
+    if await release_slot(appt["schedule_id"], appt["session"], appt["slot_time"], update.effective_user.id):
+        await waitlist.offer_freed_slots(appt["schedule_id"])
 
-    await update.message.reply_text("✅ Appointment cancelled.")
+    await query.edit_message_text(f"✅ Appointment cancelled.\n🏥 {appt['hospital']}\n📅 {appt['date']}\n🕓 {appt['slot_time']}")
     return ConversationHandler.END
 
 
+@timed
+async def tap_a_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Typed text in a button-only step: re-prompt and stay in the current state.
+    await update.message.reply_text("👆 Please tap one of the buttons above, or type /cancel to stop.")
+    return None
+
+
+@timed
+async def waitlist_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    action, entry_id = query.data.split(":")
+
+    if action == "wd":
+        await waitlist.decline(entry_id, update.effective_user.id)
+        await query.edit_message_text("👍 No problem, the slot was passed on.")
+        return
+
+    entry = await waitlist.accept(entry_id, update.effective_user.id)
+    if not entry:
+        await query.edit_message_text("⌛ Sorry, this offer is no longer available.")
+        return
+    await query.edit_message_text(
+        f"✅ Appointment booked!\n🏥 {entry['hospital']}\n📅 {entry['date']}\n🕓 {entry['time']}"
+    )
+
+
+@timed
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("❌ Cancelled.")
     return ConversationHandler.END
@@ -237,10 +307,10 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # -------------------- REGISTER --------------------
 
-def register_patient_handler(app, doctor_id: int):
-    app.bot_data["doctor_id"] = doctor_id
-
+def register_patient_handler(app):
     booking_conv = ConversationHandler(
+        name="booking",
+        persistent=True,
         entry_points=[CommandHandler("start", start_handler)],
         states={
             NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_name)],
@@ -248,9 +318,18 @@ def register_patient_handler(app, doctor_id: int):
             SEX: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_sex)],
             REASON: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_reason)],
             PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_phone)],
-            HOSPITAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_hospital)],
-            SELECT_DAY: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_day)],
-            SELECT_SESSION: [MessageHandler(filters.TEXT & ~filters.COMMAND, select_session)],
+            HOSPITAL: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, collect_hospital),
+                CallbackQueryHandler(join_waitlist, pattern=r"^w:join$"),
+            ],
+            SELECT_DAY: [
+                CallbackQueryHandler(select_day, pattern=r"^dp?:\d+$"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, tap_a_button),
+            ],
+            SELECT_SESSION: [
+                CallbackQueryHandler(select_session, pattern=r"^s:"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, tap_a_button),
+            ],
         },
         fallbacks=[
             CommandHandler("cancel", cancel),
@@ -259,12 +338,18 @@ def register_patient_handler(app, doctor_id: int):
     )
 
     cancel_conv = ConversationHandler(
+        name="cancel_appointment",
+        persistent=True,
         entry_points=[CommandHandler("myappointment", my_appointment)],
         states={
-            CONFIRM_CANCEL: [MessageHandler(filters.TEXT & ~filters.COMMAND, confirm_cancel)],
+            CONFIRM_CANCEL: [
+                CallbackQueryHandler(confirm_cancel, pattern=r"^ap?:\d+$"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, tap_a_button),
+            ],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
     )
 
     app.add_handler(booking_conv)
     app.add_handler(cancel_conv)
+    app.add_handler(CallbackQueryHandler(waitlist_response, pattern=r"^w[ad]:[0-9a-f]{24}$"))
@@ -0,0 +1,71 @@
+import re
+from services.registry import registry
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+SESSIONS = ["Morning", "Afternoon", "Both"]
+SEXES = ["Male", "Female", "Other"]
+MAX_AGE = 120
+MAX_TEXT_LENGTH = 200
+
+# Everything below is built once at import; each check is a regex match or a dict lookup.
+_SEPARATORS = re.compile(r"[\s\-().]+")
+_LOCAL_PHONE = re.compile(r"^(?:\+?251|0)([79]\d{8})$")
+_INTERNATIONAL_PHONE = re.compile(r"^\+([1-9]\d{7,14})$")
+_AGE = re.compile(r"^\d{1,3}$")
+
+_DAY_LOOKUP = {**{d.lower(): d for d in DAYS}, **{d[:3].lower(): d for d in DAYS}}
+_DAY_INDEX = {d: i for i, d in enumerate(DAYS)}
+_SESSION_LOOKUP = {s.lower(): s for s in SESSIONS}
+_SEX_LOOKUP = {**{s.lower(): s for s in SEXES}, **{s[0].lower(): s for s in SEXES}}
+
+
+def _key(text):
+    """Case- and whitespace-insensitive lookup key."""
+    return " ".join(text.split()).lower()
+
+
+def normalize_text(text):
+    """Trimmed free text (name, reason), or None if empty or too long."""
+    text = " ".join(text.split())
+    return text if 0 < len(text) <= MAX_TEXT_LENGTH else None
+
+
+def normalize_age(text):
+    text = text.strip()
+    if not _AGE.match(text) or int(text) > MAX_AGE:
+        return None
+    return str(int(text))
+
+
+def normalize_phone(text):
+    """Ethiopian numbers in any common spelling become +2519XXXXXXXX / +2517XXXXXXXX."""
+    compact = _SEPARATORS.sub("", text)
+    match = _LOCAL_PHONE.match(compact)
+    if match:
+        return f"+251{match.group(1)}"
+    match = _INTERNATIONAL_PHONE.match(compact)
+    return f"+{match.group(1)}" if match else None
+
+
+def normalize_sex(text):
+    return _SEX_LOOKUP.get(_key(text))
+
+
+def normalize_day(text):
+    return _DAY_LOOKUP.get(_key(text))
+
+
+def day_index(day):
+    return _DAY_INDEX[day]
+
+
+def normalize_session(text):
+    return _SESSION_LOOKUP.get(_key(text))
+
+
+def normalize_hospital(text, doctor_id=None):
+    """Canonical hospital name, limited to one doctor's hospitals when `doctor_id` is given."""
+    hospital = registry.hospital_named(_key(text))
+    if hospital is None or (doctor_id is not None and hospital not in registry.hospitals(doctor_id)):
+        return None
+    return hospital
@@ -0,0 +1,47 @@
+"""Rebuild the Appointments collection from the slots embedded in DoctorAvailability.
+
+Usage: python -m scripts.backfill_appointments
+"""
+import asyncio
+import datetime
+from pymongo import UpdateOne
+from services.db import doctor_availability, appointments, ensure_indexes
+
+BATCH_SIZE = 500
+
+
+async def backfill():
+    await ensure_indexes()
+    ops = []
+    written = 0
+
+    async for doc in doctor_availability.find({}, {"doctorId": 1, "hospital": 1, "date": 1, "sessions": 1}):
+        for session_name, session in doc.get("sessions", {}).items():
+            for slot in session.get("slots", []):
+                if not slot.get("patientId"):
+                    continue
+                key = {"scheduleId": doc["_id"], "session": session_name, "time": slot["time"]}
+                ops.append(UpdateOne(key, {
+                    "$set": {
+                        "patientId": slot["patientId"],
+                        "doctorId": doc.get("doctorId"),
+                        "hospital": doc["hospital"],
+                        "date": doc["date"],
+                    },
+                    "$setOnInsert": {"createdAt": datetime.datetime.utcnow()},
+                }, upsert=True))
+
+        if len(ops) >= BATCH_SIZE:
+            await appointments.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+
+    if ops:
+        await appointments.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    print(f"✅ Backfilled {written} appointments.")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
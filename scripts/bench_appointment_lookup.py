@@ -0,0 +1,146 @@
+"""Compare the old slot-scanning patient lookups with the indexed Appointments queries.
+
+Usage: python -m scripts.bench_appointment_lookup --schedules 10000 --mongo-uri mongodb://localhost:27017
+
+Seeds a throwaway database (default doctor_appointments_bench, dropped first)
+with `--schedules` DoctorAvailability documents spread over the coming weeks,
+books a fraction of their slots and mirrors them into Appointments, then times
+the two lookups the bot does per patient:
+
+  week check      "does this patient already have an appointment this week?"
+  upcoming        /myappointment: every future appointment of the patient
+
+"scan" is the pre-Appointments approach (read every schedule in the range and
+walk the slots in Python); "index" is services.booking. Documents examined come
+from explain().
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--schedules", type=int, default=10000)
+parser.add_argument("--lookups", type=int, default=50)
+parser.add_argument("--booked-fraction", type=float, default=0.5)
+parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+parser.add_argument("--db-name", default="doctor_appointments_bench")
+args = parser.parse_args()
+
+# services.db reads these at import time.
+os.environ["MONGO_URI"] = args.mongo_uri
+os.environ["MONGO_DB_NAME"] = args.db_name
+
+from handlers.admin import build_sessions  # noqa: E402
+from services import db  # noqa: E402
+from services.booking import find_week_appointment, upcoming_appointments  # noqa: E402
+
+HOSPITALS = ["Abet Hospital", "Ethio Tebib Hospital", "Girum Hospital"]
+DOCTORS = 50
+PATIENTS = 20000
+BATCH_SIZE = 1000
+
+
+async def seed():
+    today = datetime.date.today()
+    days = max(1, args.schedules // DOCTORS)
+    schedules, booked = [], []
+    for i in range(args.schedules):
+        date = today + datetime.timedelta(days=i % days)
+        doc = {
+            "doctorId": i // days,
+            "hospital": HOSPITALS[i % len(HOSPITALS)],
+            "date": str(date),
+            "sessions": build_sessions(date, "Both"),
+        }
+        for session_name, session in doc["sessions"].items():
+            for slot in session["slots"]:
+                if random.random() < args.booked_fraction:
+                    slot.update(available=False, patientId=random.randrange(PATIENTS))
+                    booked.append((doc, session_name, slot))
+            session["availableCount"] = sum(1 for s in session["slots"] if s["available"])
+        schedules.append(doc)
+
+    for start in range(0, len(schedules), BATCH_SIZE):
+        await db.doctor_availability.insert_many(schedules[start:start + BATCH_SIZE])
+    appointments = [{
+        "patientId": slot["patientId"],
+        "doctorId": doc["doctorId"],
+        "scheduleId": doc["_id"],
+        "hospital": doc["hospital"],
+        "date": doc["date"],
+        "session": session_name,
+        "time": slot["time"],
+    } for doc, session_name, slot in booked]
+    for start in range(0, len(appointments), BATCH_SIZE):
+        await db.appointments.insert_many(appointments[start:start + BATCH_SIZE])
+    return len(appointments)
+
+
+async def scan_week(patient_id, date):
+    week_start = date - datetime.timedelta(days=date.weekday())
+    week_end = week_start + datetime.timedelta(days=6)
+    async for doc in db.doctor_availability.find({"date": {"$gte": str(week_start), "$lte": str(week_end)}}):
+        for session in doc.get("sessions", {}).values():
+            for slot in session["slots"]:
+                if slot.get("patientId") == patient_id:
+                    return doc
+    return None
+
+
+async def scan_upcoming(patient_id):
+    found = []
+    async for doc in db.doctor_availability.find({"date": {"$gte": str(datetime.date.today())}}).sort("date"):
+        for session in doc.get("sessions", {}).values():
+            found.extend(slot for slot in session["slots"] if slot.get("patientId") == patient_id)
+    return found
+
+
+async def docs_examined(collection, query):
+    plan = await collection.find(query).explain()
+    return plan["executionStats"]["totalDocsExamined"]
+
+
+async def time_lookups(label, lookup, patients):
+    timings = []
+    for patient_id in patients:
+        started = time.perf_counter()
+        await lookup(patient_id)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"  {label:22} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+          f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:8.2f} ms")
+
+
+async def main():
+    random.seed(1)
+    await db.get_client().drop_database(args.db_name)
+    await db.ensure_indexes()
+    started = time.perf_counter()
+    appointments = await seed()
+    print(f"Seeded {args.schedules} schedules and {appointments} appointments in {time.perf_counter() - started:.1f}s")
+
+    today = datetime.date.today()
+    week_start, week_end = today - datetime.timedelta(days=today.weekday()), today + datetime.timedelta(days=6)
+    patients = [random.randrange(PATIENTS) for _ in range(args.lookups)]
+
+    print("\nWeek check:")
+    await time_lookups("scan DoctorAvailability", lambda p: scan_week(p, today), patients)
+    await time_lookups("index Appointments", lambda p: find_week_appointment(p, today), patients)
+    print("\nUpcoming appointments:")
+    await time_lookups("scan DoctorAvailability", scan_upcoming, patients)
+    await time_lookups("index Appointments", upcoming_appointments, patients)
+
+    week = {"$gte": str(week_start), "$lte": str(week_end)}
+    print("\nDocuments examined for one week check:")
+    print(f"  scan   {await docs_examined(db.doctor_availability, {'date': week})}")
+    print(f"  index  {await docs_examined(db.appointments, {'patientId': patients[0], 'date': week})}")
+
+    await db.get_client().drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Time a cold start: from spawning the server process to its first webhook acknowledgement.
+
+Usage:
+    python -m scripts.bench_cold_start --runs 5
+    python -m scripts.bench_cold_start --runs 5 --offline
+
+Each run starts `uvicorn bot:app` in a fresh process, as the deployment does,
+and posts an empty update to the webhook until it is answered with 200.
+Uvicorn only accepts connections once the startup hook has finished, so this
+covers interpreter start-up, imports, index/registry loading, the Telegram
+setup calls and scheduler start. The bot's own startup log line (time since
+bot.py's imports began) is printed for comparison.
+
+BOT_TOKEN and MONGO_URI come from the environment. --offline answers the
+Telegram calls with scripts.fake_telegram.FakeBot instead, so no real bot is
+needed (MongoDB still is); it leaves out Telegram's round-trips.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+STARTUP_TIMEOUT = 60
+
+
+def serve(port):
+    """Child process for --offline: the real app with Telegram replaced by FakeBot."""
+    os.environ.setdefault("BOT_TOKEN", "1:coldstart")
+    os.environ["WEBHOOK_URL"] = ""
+    import uvicorn
+    import bot
+    from scripts.fake_telegram import FakeBot
+
+    bot.telegram_app.bot = bot.telegram_app.updater.bot = FakeBot(bot.BOT_TOKEN)
+    uvicorn.run(bot.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def run_once(port, offline, token):
+    if offline:
+        command = [sys.executable, "-m", "scripts.bench_cold_start", "--serve", "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "bot:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning"]
+    endpoint = f"http://127.0.0.1:{port}/webhook/{token}"
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        with httpx.Client(timeout=5) as client:
+            update_id = 1
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited during startup:\n{process.stdout.read()}")
+                if time.perf_counter() - started > STARTUP_TIMEOUT:
+                    raise RuntimeError(f"no webhook ack within {STARTUP_TIMEOUT}s")
+                try:
+                    # An update without content is acknowledged and then ignored by every handler.
+                    if client.post(endpoint, json={"update_id": update_id}).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                update_id += 1
+                time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=30)
+
+    log = next((line for line in output.splitlines() if "Startup since bot.py import" in line), "")
+    return elapsed, log
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--offline", action="store_true", help="Answer Telegram calls locally")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    token = os.getenv("BOT_TOKEN", "1:coldstart" if args.offline else None)
+    if not token:
+        parser.error("BOT_TOKEN must be set (or use --offline)")
+
+    timings = []
+    for run in range(1, args.runs + 1):
+        elapsed, log = run_once(args.port, args.offline, token)
+        timings.append(elapsed)
+        print(f"run {run}: first ack after {elapsed * 1000:.0f} ms  |  {log.strip()}")
+
+    print(f"\nSpawn to first webhook ack: median {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms over {len(timings)} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure the per-update cost of MongoPersistence against in-memory persistence.
+
+Usage: python -m scripts.bench_persistence --chats 500 --mongo-uri mongodb://localhost:27017
+
+Each chat walks the booking questions up to the phone number (no booking
+queries), so the only Mongo traffic is persistence. Modes:
+
+  memory   DictPersistence, the no-database baseline
+  mongo    MongoPersistence with the write-behind buffer
+  shared   MongoPersistence(shared=True): also re-reads conversation state and user_data
+           before each update and writes them through after it
+
+Reported: per-update p50/p99 handling time and Mongo commands per update,
+including PTB's persistence job and the final flush.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--chats", type=int, default=500)
+parser.add_argument("--concurrency", type=int, default=50)
+parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+parser.add_argument("--db-name", default="doctor_appointments_bench")
+args = parser.parse_args()
+
+# services.db reads these at import time.
+os.environ["MONGO_URI"] = args.mongo_uri
+os.environ["MONGO_DB_NAME"] = args.db_name
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, DictPersistence  # noqa: E402
+from handlers.patient import register_patient_handler  # noqa: E402
+from services import db, metrics  # noqa: E402
+from services.persistence import MongoPersistence  # noqa: E402
+from scripts.fake_telegram import FakeBot, message_update  # noqa: E402
+
+MESSAGES = ["/start", "Bench Patient", "30", "Female", "Checkup", "0911000000"]
+
+
+def mongo_commands():
+    with metrics.mongo_latency._lock:
+        return sum(series["count"] for series in metrics.mongo_latency._series.values())
+
+
+async def run_mode(mode, first_chat):
+    persistence = DictPersistence() if mode == "memory" else MongoPersistence(shared=mode == "shared")
+    app = ApplicationBuilder().bot(FakeBot("1:bench")).persistence(persistence).build()
+    register_patient_handler(app)
+    await app.initialize()
+    await app.start()
+
+    timings = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def chat(chat_id):
+        async with semaphore:
+            for text in MESSAGES:
+                update = Update.de_json(message_update(chat_id, text), app.bot)
+                started = time.perf_counter()
+                if mode == "shared":
+                    await persistence.refresh(update, app)
+                await app.process_update(update)
+                if mode == "shared":
+                    await persistence.write_through(app)
+                timings.append(time.perf_counter() - started)
+
+    commands_before = mongo_commands()
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(first_chat + i) for i in range(args.chats)))
+    await app.stop()
+    await app.shutdown()  # runs the final update_persistence and, for Mongo, flushes the buffer
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    print(f"{mode:>7} {statistics.median(timings) * 1000:>9.3f} {timings[int(len(timings) * 0.99) - 1] * 1000:>9.3f} "
+          f"{(mongo_commands() - commands_before) / len(timings):>14.2f} {elapsed:>8.2f}s")
+
+
+async def main():
+    await db.get_client().drop_database(args.db_name)
+    await db.ensure_indexes()
+    print(f"{'mode':>7} {'p50 ms':>9} {'p99 ms':>9} {'mongo/update':>14} {'total':>9}")
+    for i, mode in enumerate(["memory", "mongo", "shared"]):
+        await run_mode(mode, 30_000_000 + i * args.chats)
+    await db.get_client().drop_database(args.db_name)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Offline stand-ins for the Telegram side, shared by the simulator and the latency sweep."""
+import itertools
+import time
+from collections import Counter
+from telegram import InlineKeyboardMarkup
+from telegram.ext import ExtBot
+
+
+class FakeBot(ExtBot):
+    """Answers every Bot API call locally and remembers the last text and inline keyboard per chat."""
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        # Bot objects are frozen after __init__.
+        with self._unfrozen():
+            self._message_ids = itertools.count(1)
+            self.calls = Counter()
+            self.keyboards = {}
+            self.texts = {}
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        self.calls[endpoint] += 1
+        if endpoint == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Sim", "username": "sim_bot"}
+        if endpoint in ("answerCallbackQuery", "setMyCommands", "setWebhook"):
+            return True
+        if endpoint == "getMyCommands":
+            return []
+        if endpoint == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+
+        chat_id = int(data.get("chat_id", 0))
+        if "text" in data:
+            self.texts[chat_id] = data["text"]
+        markup = data.get("reply_markup")
+        if isinstance(markup, InlineKeyboardMarkup):
+            self.keyboards[chat_id] = [button.callback_data for row in markup.inline_keyboard for button in row]
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data.get("text", ""),
+        }
+
+
+update_ids = itertools.count(1)
+
+
+def message_update(user_id, text):
+    user = {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"}
+    message = {
+        "message_id": next(update_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(update_ids), "message": message}
+
+
+def callback_update(user_id, data):
+    user = {"id": user_id, "is_bot": False, "first_name": f"U{user_id}"}
+    return {
+        "update_id": next(update_ids),
+        "callback_query": {
+            "id": str(next(update_ids)),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "",
+            },
+        },
+    }
@@ -0,0 +1,143 @@
+"""Show that webhook latency stays flat while MongoDB gets slower.
+
+Usage: python -m scripts.latency_sweep --mongo-uri mongodb://localhost:27017 --delays 0,10,50,200
+
+Runs the real FastAPI app and handlers in-process (Telegram is replaced by
+scripts.fake_telegram.FakeBot) against a throwaway database on a local mongod.
+For each delay, every Mongo command is slowed down by that many milliseconds
+in the driver thread (InjectedLatency, on a client built here for the sweep), then the loadgen traffic
+mix is replayed through the webhook. Reported per level:
+
+  ack p50/p99   webhook response time as Telegram would see it
+  loop lag p99  how late a 10 ms asyncio timer fires, i.e. whether anything blocks the event loop
+  drain         time until every queued update has been processed
+
+With Motor, ack latency and loop lag should stay flat while drain time grows.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+parser.add_argument("--db-name", default="doctor_appointments_sweep")
+parser.add_argument("--delays", default="0,5,20,50,100", help="Comma-separated injected Mongo latencies in ms")
+parser.add_argument("--count", type=int, default=1000, help="Updates per level")
+parser.add_argument("--concurrency", type=int, default=50)
+parser.add_argument("--chats", type=int, default=100)
+args = parser.parse_args()
+
+# bot.py and services.db read these at import time.
+os.environ.update({"BOT_TOKEN": "1:sweep", "WEBHOOK_URL": "", "MONGO_URI": args.mongo_uri, "MONGO_DB_NAME": args.db_name})
+
+import httpx  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from pymongo import monitoring  # noqa: E402
+import bot  # noqa: E402
+from services import db  # noqa: E402
+from services.metrics import MongoCommandListener  # noqa: E402
+from services.registry import registry, DEFAULT_HOSPITALS  # noqa: E402
+from scripts.fake_telegram import FakeBot  # noqa: E402
+from scripts.loadgen import make_update  # noqa: E402
+
+# Booking questions, a cached availability read and an uncached /myappointment read.
+MESSAGES = ["/start", "Load Patient", "30", "Female", "Checkup", "0911000000", DEFAULT_HOSPITALS[0], "/myappointment"]
+
+
+class InjectedLatency(monitoring.CommandListener):
+    """Sleeps in the driver thread before each command, like a slower or more distant server would."""
+
+    def __init__(self):
+        self.delay_ms = 0
+
+    def started(self, event):
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+injected_latency = InjectedLatency()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def measure_loop_lag(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def run_level(client, level, delay_ms):
+    injected_latency.delay_ms = delay_ms
+    first_id = 1 + level * args.count
+    payloads = [
+        make_update(first_id + i, 20_000_000 + level * args.chats + i % args.chats, MESSAGES[(i // args.chats) % len(MESSAGES)])
+        for i in range(args.count)
+    ]
+
+    acks, lags, stop = [], [], asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lags, stop))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def send(payload):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(f"/webhook/{bot.BOT_TOKEN}", json=payload)
+            acks.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(p) for p in payloads))
+    await asyncio.gather(*(queue.join() for queue in bot.update_queue.shards))
+    drain = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    print(f"{delay_ms:>8.0f} {statistics.median(acks) * 1000:>9.2f} {percentile(acks, 0.99) * 1000:>9.2f} "
+          f"{percentile(lags, 0.99) * 1000:>13.2f} {drain:>9.2f}s {args.count / drain:>9.0f}")
+
+
+async def main():
+    # Same settings as services.db.get_client, plus the delay listener; created inside the loop Motor will use.
+    db._client = AsyncIOMotorClient(
+        args.mongo_uri,
+        maxPoolSize=db.MONGO_MAX_POOL_SIZE,
+        minPoolSize=db.MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=db.MONGO_TIMEOUT_MS,
+        event_listeners=[MongoCommandListener(), injected_latency],
+    )
+    await db.get_client().drop_database(args.db_name)
+    await db.ensure_indexes()
+    await registry.load(bootstrap_doctor_id=1)
+
+    fake = FakeBot(bot.BOT_TOKEN)
+    bot.telegram_app.bot = bot.telegram_app.updater.bot = fake
+    await bot.telegram_app.initialize()
+    bot.update_queue.start()
+
+    print(f"{'delay ms':>8} {'ack p50':>9} {'ack p99':>9} {'loop lag p99':>13} {'drain':>10} {'updates/s':>9}")
+    transport = httpx.ASGITransport(app=bot.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://sweep") as client:
+        for level, delay in enumerate(float(d) for d in args.delays.split(",")):
+            await run_level(client, level, delay)
+
+    injected_latency.delay_ms = 0
+    await bot.update_queue.stop()
+    await bot.persistence.flush()
+    await bot.telegram_app.shutdown()
+    print(f"Queue: {bot.update_queue.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Replay synthetic Telegram updates against the webhook to measure ingestion throughput.
+
+Usage: python -m scripts.loadgen --url http://localhost:8000 --token $BOT_TOKEN --count 5000
+
+Each synthetic chat sends /start followed by a few free-text replies, so the
+run exercises per-chat ordering as well as cross-chat concurrency. Replies to
+the fake chats fail at Telegram; only the webhook acknowledgement is timed.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+import httpx
+
+MESSAGES = ["/start", "Test Patient", "30", "Female", "Checkup", "0911000000"]
+
+
+def make_update(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+            **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text)}]}
+               if text.startswith("/") else {}),
+        },
+    }
+
+
+async def run(url, token, count, concurrency, chats, duplicate_every):
+    endpoint = f"{url}/webhook/{token}"
+    ids = itertools.count(1)
+    payloads = []
+    for i in range(count):
+        chat_id = 10_000_000 + i % chats
+        payloads.append(make_update(next(ids), chat_id, MESSAGES[(i // chats) % len(MESSAGES)]))
+        if duplicate_every and i % duplicate_every == 0:
+            payloads.append(payloads[-1])
+
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def send(payload):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(endpoint, json=payload)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(p) for p in payloads))
+        elapsed = time.perf_counter() - started
+        queue = (await client.get(f"{url}/queue")).json()
+
+    latencies.sort()
+    print(f"Sent {len(payloads)} updates in {elapsed:.2f}s ({len(payloads) / elapsed:.0f}/s)")
+    print(f"Ack latency: p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+    print(f"HTTP statuses: {statuses}")
+    print(f"Queue: {queue}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--duplicate-every", type=int, default=50,
+                        help="Resend every Nth update to exercise dedup (0 disables)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.token, args.count, args.concurrency, args.chats, args.duplicate_every))
@@ -0,0 +1,84 @@
+"""Move embedded patientInfo out of DoctorAvailability slots onto their Appointments and add availableCount.
+
+Usage: python -m scripts.migrate_compact_slots
+
+Each booked slot's details become the `patient` field of its Appointments
+entry (keyed on scheduleId/session/time and upserted like
+scripts.backfill_appointments), so every visit keeps its own name and reason.
+
+Prints average/max schedule document size and the time to read every
+hospital's schedules before and after the migration.
+"""
+import asyncio
+import datetime
+import time
+from pymongo import UpdateOne
+from services.db import doctor_availability, appointments
+from services.availability import availability_cache
+
+BATCH_SIZE = 500
+
+
+async def measure(label):
+    sizes = await doctor_availability.aggregate([
+        {"$group": {"_id": None, "avg": {"$avg": {"$bsonSize": "$$ROOT"}}, "max": {"$max": {"$bsonSize": "$$ROOT"}}}},
+    ]).to_list(length=1)
+    hospitals = await doctor_availability.distinct("hospital")
+
+    started = time.perf_counter()
+    for hospital in hospitals:
+        await doctor_availability.find({"hospital": hospital}).to_list(length=None)
+    read_ms = (time.perf_counter() - started) * 1000
+
+    if sizes:
+        print(f"{label}: avg doc {sizes[0]['avg']:.0f} B, max {sizes[0]['max']} B, "
+              f"full read of {len(hospitals)} hospitals {read_ms:.1f} ms")
+
+
+async def migrate():
+    await measure("Before")
+
+    schedule_ops, appointment_ops = [], []
+    async for doc in doctor_availability.find({}, {"doctorId": 1, "hospital": 1, "date": 1, "sessions": 1}):
+        update = {"$unset": {}, "$set": {}}
+        for session_name, session in doc.get("sessions", {}).items():
+            slots = session.get("slots", [])
+            update["$set"][f"sessions.{session_name}.availableCount"] = sum(1 for s in slots if s.get("available"))
+            for i, slot in enumerate(slots):
+                if "patientInfo" not in slot:
+                    continue
+                update["$unset"][f"sessions.{session_name}.slots.{i}.patientInfo"] = ""
+                if slot.get("patientId") and slot["patientInfo"]:
+                    key = {"scheduleId": doc["_id"], "session": session_name, "time": slot["time"]}
+                    appointment_ops.append(UpdateOne(key, {
+                        "$set": {
+                            "patient": slot["patientInfo"],
+                            "patientId": slot["patientId"],
+                            "doctorId": doc.get("doctorId"),
+                            "hospital": doc["hospital"],
+                            "date": doc["date"],
+                        },
+                        "$setOnInsert": {"createdAt": datetime.datetime.utcnow()},
+                    }, upsert=True))
+        update = {op: fields for op, fields in update.items() if fields}
+        if update:
+            schedule_ops.append(UpdateOne({"_id": doc["_id"]}, update))
+
+        if len(schedule_ops) >= BATCH_SIZE:
+            # Details are written to Appointments before they are removed from the slots.
+            if appointment_ops:
+                await appointments.bulk_write(appointment_ops, ordered=False)
+            await doctor_availability.bulk_write(schedule_ops, ordered=False)
+            schedule_ops, appointment_ops = [], []
+
+    if appointment_ops:
+        await appointments.bulk_write(appointment_ops, ordered=False)
+    if schedule_ops:
+        await doctor_availability.bulk_write(schedule_ops, ordered=False)
+
+    availability_cache.clear()
+    await measure("After")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,31 @@
+"""Recompute the DailyStats utilization counters from DoctorAvailability.
+
+Usage: python -m scripts.rebuild_stats [--doctor-id ID]
+
+Run once after deploying /stats so schedules created earlier are counted,
+or any time the counters are suspected to have drifted. Schedules without a
+doctorId are not counted; run `python -m scripts.register_doctor --id ID
+--claim-unassigned` first to assign them.
+"""
+import argparse
+import asyncio
+from services.db import daily_stats, doctor_availability, ensure_indexes
+from services.stats import rebuild
+
+
+async def main(doctor_id):
+    # $merge needs the unique (doctorId, date, hospital, session) index.
+    await ensure_indexes()
+    if doctor_id is None:
+        unassigned = await doctor_availability.count_documents({"doctorId": {"$not": {"$type": "number"}}})
+        if unassigned:
+            print(f"⚠️ Skipping {unassigned} schedule(s) without a doctorId; run register_doctor --claim-unassigned first.")
+    await rebuild(doctor_id)
+    query = {} if doctor_id is None else {"doctorId": doctor_id}
+    print(f"✅ DailyStats rebuilt: {await daily_stats.count_documents(query)} day/session rows.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctor-id", type=int)
+    asyncio.run(main(parser.parse_args().doctor_id))
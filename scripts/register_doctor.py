@@ -0,0 +1,40 @@
+"""Add or update a doctor in the Doctors registry.
+
+Usage:
+    python -m scripts.register_doctor --id 123456 --name "Dr. Abebe" --hospitals "Abet Hospital" "Girum Hospital"
+    python -m scripts.register_doctor --id 123456 --claim-unassigned
+
+--claim-unassigned assigns schedules and appointments created before
+multi-doctor support (no doctorId, or a null one) to this doctor.
+"""
+import argparse
+import asyncio
+from services.db import doctors, doctor_availability, appointments, ensure_indexes
+
+
+async def register(doctor_id, name, hospitals, claim_unassigned):
+    await ensure_indexes()
+    fields = {}
+    if name:
+        fields["name"] = name
+    if hospitals:
+        fields["hospitals"] = hospitals
+    if fields:
+        await doctors.update_one({"_id": doctor_id}, {"$set": fields}, upsert=True)
+        print(f"✅ Saved doctor {doctor_id}: {fields}")
+
+    if claim_unassigned:
+        unassigned = {"doctorId": None}  # missing or null
+        schedules = await doctor_availability.update_many(unassigned, {"$set": {"doctorId": doctor_id}})
+        appts = await appointments.update_many(unassigned, {"$set": {"doctorId": doctor_id}})
+        print(f"✅ Claimed {schedules.modified_count} schedules and {appts.modified_count} appointments.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--id", type=int, required=True, help="Doctor's Telegram user id")
+    parser.add_argument("--name")
+    parser.add_argument("--hospitals", nargs="+")
+    parser.add_argument("--claim-unassigned", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(register(args.id, args.name, args.hospitals, args.claim_unassigned))
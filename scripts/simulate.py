@@ -0,0 +1,230 @@
+"""Offline simulator for the booking flows.
+
+Drives the real conversation handlers with synthetic updates through a fake
+Bot (no Telegram traffic) against a local mongod, then reports throughput,
+per-step latency, DB operations per booking and data-integrity checks.
+
+Usage: python -m scripts.simulate --patients 2000 --concurrency 200 --mongo-uri mongodb://localhost:27017
+
+Everything is written to a throwaway database (default doctor_appointments_sim),
+which is dropped before each run.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--doctors", type=int, default=3)
+    parser.add_argument("--cancel-rate", type=float, default=0.2,
+                        help="Fraction of booked patients who then cancel via /myappointment")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="doctor_appointments_sim")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+args = parse_args()
+# services.db reads these at import time.
+os.environ["MONGO_URI"] = args.mongo_uri
+os.environ["MONGO_DB_NAME"] = args.db_name
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder, DictPersistence  # noqa: E402
+from handlers.admin import DAYS, register_schedule_handler  # noqa: E402
+from handlers.patient import register_patient_handler  # noqa: E402
+from services import db  # noqa: E402
+from services.registry import registry, DEFAULT_HOSPITALS  # noqa: E402
+from services.scheduler import notifier  # noqa: E402
+from scripts.fake_telegram import FakeBot, message_update, callback_update  # noqa: E402
+
+DOCTOR_BASE_ID = 900_000
+PATIENT_BASE_ID = 1_000_000
+
+
+class CountingCollection:
+    """Wraps a Motor collection and counts the operations issued through it."""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if not callable(value):
+            return value
+
+        def counted(*a, **kw):
+            self._counter[f"{self._collection.name}.{attr}"] += 1
+            return value(*a, **kw)
+        return counted
+
+
+# -------------------- simulation --------------------
+
+class Simulation:
+    def __init__(self, app):
+        self.app = app
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self.errors = Counter()
+
+    async def on_error(self, update, context):
+        self.errors[repr(context.error)[:120]] += 1
+
+    async def send(self, step, payload):
+        update = Update.de_json(payload, self.app.bot)
+        started = time.perf_counter()
+        await self.app.process_update(update)
+        self.latencies[step].append(time.perf_counter() - started)
+
+    async def doctor_publishes(self, doctor_id, hospitals):
+        pattern = "\n".join(f"{hospitals[i % len(hospitals)]}, {day}, Both" for i, day in enumerate(DAYS))
+        await self.send("admin.template", message_update(doctor_id, "/template"))
+        await self.send("admin.select_template", message_update(doctor_id, pattern))
+        await self.send("admin.apply_template", message_update(doctor_id, "1"))
+
+    async def patient_books(self, user_id, hospital, cancel):
+        bot = self.app.bot
+        for step, text in [
+            ("patient.start", "/start"), ("patient.collect_name", "Sim Patient"), ("patient.collect_age", "30"),
+            ("patient.collect_sex", "Female"), ("patient.collect_reason", "Checkup"),
+            ("patient.collect_phone", "0911000000"), ("patient.collect_hospital", hospital),
+        ]:
+            await self.send(step, message_update(user_id, text))
+
+        days = [d for d in bot.keyboards.get(user_id, []) if d.startswith("d:")]
+        if not days:
+            self.outcomes["no_availability"] += 1
+            return
+        await self.send("patient.select_day", callback_update(user_id, days[0]))
+
+        sessions = [s for s in bot.keyboards.get(user_id, []) if s.startswith("s:")]
+        if not sessions:
+            self.outcomes["day_filled"] += 1
+            return
+        appointments_before = await appointment_count(user_id)
+        await self.send("patient.select_session", callback_update(user_id, random.choice(sessions)))
+        if await appointment_count(user_id) <= appointments_before:
+            self.outcomes["session_filled"] += 1
+            return
+        self.outcomes["booked"] += 1
+
+        if cancel:
+            await self.send("patient.my_appointment", message_update(user_id, "/myappointment"))
+            await self.send("patient.confirm_cancel", callback_update(user_id, "a:0"))
+            cancelled = await appointment_count(user_id) <= appointments_before
+            self.outcomes["cancelled" if cancelled else "cancel_failed"] += 1
+
+
+async def appointment_count(patient_id):
+    # Unwrapped collection: the simulator's own bookkeeping is not counted as bot DB load.
+    return await db.get_db()["Appointments"].count_documents({"patientId": patient_id})
+
+
+async def check_integrity():
+    problems = []
+    slot_owners = Counter()
+    booked_slots = 0
+    async for schedule in db.doctor_availability.find({}):
+        for name, session in schedule["sessions"].items():
+            free = sum(1 for slot in session["slots"] if slot["available"])
+            if free != session["availableCount"]:
+                problems.append(f"{schedule['_id']}/{name}: availableCount {session['availableCount']} != {free} free")
+            for slot in session["slots"]:
+                if slot.get("patientId"):
+                    booked_slots += 1
+                    slot_owners[slot["patientId"]] += 1
+                    if slot["available"]:
+                        problems.append(f"{schedule['_id']}/{name} {slot['time']}: booked slot marked available")
+    doubles = [p for p, n in slot_owners.items() if n > 1]
+    if doubles:
+        problems.append(f"{len(doubles)} patients hold more than one slot")
+    appointments = await db.appointments.count_documents({})
+    if appointments != booked_slots:
+        problems.append(f"{appointments} Appointments documents for {booked_slots} booked slots")
+    return problems
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def main():
+    random.seed(args.seed)
+    await db.get_client().drop_database(args.db_name)
+    await db.ensure_indexes()
+
+    ops = Counter()
+    for name in dir(db):
+        lazy = getattr(db, name)
+        if isinstance(lazy, db._LazyCollection):
+            lazy._collection = CountingCollection(db.get_db()[lazy._name], ops)
+
+    doctor_ids = [DOCTOR_BASE_ID + i for i in range(args.doctors)]
+    for i, doctor_id in enumerate(doctor_ids):
+        hospitals = DEFAULT_HOSPITALS[i % len(DEFAULT_HOSPITALS):] + DEFAULT_HOSPITALS[:i % len(DEFAULT_HOSPITALS)]
+        await db.doctors.insert_one({"_id": doctor_id, "name": f"Dr. Sim {i}", "hospitals": hospitals})
+    await registry.load()
+
+    # Every conversation is persistent, so the app needs a persistence backend.
+    app = ApplicationBuilder().bot(FakeBot("1:sim")).persistence(DictPersistence()).build()
+    register_schedule_handler(app)
+    register_patient_handler(app)
+    sim = Simulation(app)
+    app.add_error_handler(sim.on_error)
+    await app.initialize()
+    notifier.start(app.bot)
+
+    for doctor_id in doctor_ids:
+        await sim.doctor_publishes(doctor_id, registry.hospitals(doctor_id))
+    setup_ops = sum(ops.values())
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_patient(i):
+        async with semaphore:
+            await sim.patient_books(
+                PATIENT_BASE_ID + i,
+                random.choice(registry.hospitals()),
+                random.random() < args.cancel_rate,
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_patient(i) for i in range(args.patients)))
+    elapsed = time.perf_counter() - started
+    await notifier.stop()
+    await app.shutdown()
+
+    patient_ops = sum(ops.values()) - setup_ops
+    updates = sum(len(v) for v in sim.latencies.values())
+
+    print(f"Patients: {args.patients}, concurrency {args.concurrency}, doctors {args.doctors}")
+    print(f"Outcomes: {dict(sim.outcomes)}")
+    print(f"Elapsed {elapsed:.2f}s, {updates / elapsed:.0f} updates/s, {sim.outcomes['booked'] / elapsed:.1f} bookings/s")
+    print(f"DB operations per patient flow: {patient_ops / max(1, args.patients):.1f}")
+    print("\nPer-step latency (ms):")
+    for step, values in sorted(sim.latencies.items()):
+        print(f"  {step:28} n={len(values):6} p50={statistics.median(values) * 1000:7.2f} "
+              f"p95={percentile(values, 0.95) * 1000:7.2f} p99={percentile(values, 0.99) * 1000:7.2f}")
+    print("\nTop DB operations:")
+    for op, count in ops.most_common(12):
+        print(f"  {op:45} {count}")
+    print(f"\nBot API calls: {dict(app.bot.calls)}")
+    if sim.errors:
+        print("\n❌ Handler errors:\n  " + "\n  ".join(f"{n} × {e}" for e, n in sim.errors.most_common()))
+
+    problems = await check_integrity()
+    print("\n✅ Integrity checks passed." if not problems else "\n❌ Integrity problems:\n  " + "\n  ".join(problems))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
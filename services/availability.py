@@ -0,0 +1,91 @@
+import asyncio
+import datetime
+import os
+from services.cache import TTLCache
+from services.db import doctor_availability
+
+# (hospital, "YYYY-MM-DD") -> [(doctorId, [session names with free slots])]; [] means none.
+availability_cache = TTLCache(
+    maxsize=int(os.getenv("AVAILABILITY_CACHE_SIZE", 1024)),
+    ttl=int(os.getenv("AVAILABILITY_CACHE_TTL", 30)),
+)
+
+
+def _summary_pipeline(match):
+    """Project each schedule down to {doctorId, date, sessions: [{name, available}]} using the per-session counters."""
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "doctorId": 1,
+            "date": 1,
+            "sessions": {"$map": {
+                "input": {"$objectToArray": "$sessions"},
+                "as": "s",
+                "in": {"name": "$$s.k", "available": "$$s.v.availableCount"},
+            }},
+        }},
+        {"$sort": {"date": 1, "doctorId": 1}},
+    ]
+
+
+async def _load_range(hospital, start, end):
+    keys = [(hospital, str(start + datetime.timedelta(days=i))) for i in range((end - start).days + 1)]
+    generations = {key: availability_cache.generation(key) for key in keys}
+
+    found = {}
+    cursor = doctor_availability.aggregate(_summary_pipeline({
+        "hospital": hospital,
+        "date": {"$gte": str(start), "$lte": str(end)},
+    }))
+    async for doc in cursor:
+        sessions = [s["name"] for s in doc["sessions"] if s["available"]]
+        if sessions:
+            found.setdefault(doc["date"], []).append((doc.get("doctorId"), sessions))
+
+    for key in keys:
+        availability_cache.set(key, found.get(key[1], []), generations[key])
+    return {key[1]: found.get(key[1], []) for key in keys}
+
+
+async def week_availability(hospital, start=None, days=7):
+    """Return [(date, doctor id, [session names with free slots])] for the next `days` days.
+
+    Served from the availability cache; any miss reloads the whole range in one query.
+    """
+    start = start or datetime.date.today()
+    dates = [start + datetime.timedelta(days=i) for i in range(days)]
+
+    by_date = {}
+    for date in dates:
+        entries = availability_cache.get((hospital, str(date)))
+        if entries is None:
+            by_date = await _load_range(hospital, start, dates[-1])
+            break
+        by_date[str(date)] = entries
+
+    return [
+        (date, doctor_id, sessions)
+        for date in dates
+        for doctor_id, sessions in by_date[str(date)]
+    ]
+
+
+async def day_availability(hospital, date, doctor_id):
+    """Return the session names of one doctor's schedule that still have free slots on one date."""
+    entries = availability_cache.get((hospital, date))
+    if entries is None:
+        day = datetime.datetime.strptime(date, "%Y-%m-%d").date()
+        entries = (await _load_range(hospital, day, day))[date]
+    return next((sessions for d, sessions in entries if d == doctor_id), [])
+
+
+def invalidate(hospital, date):
+    availability_cache.invalidate((hospital, date))
+
+
+async def warm_up(hospitals, days=7):
+    """Reload the next `days` days for every hospital into the cache concurrently."""
+    start = datetime.date.today()
+    end = start + datetime.timedelta(days=days - 1)
+    await asyncio.gather(*(_load_range(hospital, start, end) for hospital in hospitals))
@@ -0,0 +1,110 @@
+import datetime
+from pymongo import ReturnDocument
+from services.db import doctor_availability, appointments
+from services import availability, stats
+from services.reminders import schedule_reminders, cancel_reminders
+
+
+async def book_slot(doctor_id, hospital, date, session, patient_id, patient_info):
+    """Atomically claim the first free slot of a session and record the appointment.
+
+    Slots only carry the patient's Telegram id; `patient_info` (the details
+    given for this visit) is stored on the Appointments document.
+
+    Returns the claimed slot time, or None if the session is full.
+    """
+    slots_path = f"sessions.{session}.slots"
+    before = await doctor_availability.find_one_and_update(
+        {"doctorId": doctor_id, "hospital": hospital, "date": date, f"{slots_path}.available": True},
+        {
+            "$set": {
+                f"{slots_path}.$.available": False,
+                f"{slots_path}.$.patientId": patient_id,
+            },
+            "$inc": {f"sessions.{session}.availableCount": -1},
+        },
+        projection={f"{slots_path}.time": 1, f"{slots_path}.available": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not before:
+        return None
+    availability.invalidate(hospital, date)
+
+    # The positional operator updates the first slot that matched the filter,
+    # i.e. the first one that was still available before the update.
+    slot_time = next(
+        (slot["time"] for slot in before["sessions"][session]["slots"] if slot["available"]),
+        None,
+    )
+    if slot_time:
+        await record_appointment(doctor_id, before["_id"], hospital, date, session, slot_time, patient_id, patient_info)
+    return slot_time
+
+
+async def record_appointment(doctor_id, schedule_id, hospital, date, session, slot_time, patient_id, patient_info):
+    """Write the Appointments entry and reminders for a slot that has already been claimed.
+
+    Name, age, sex, reason and phone are kept per appointment: one Telegram
+    account may book for different family members, and the reason differs per visit.
+    """
+    result = await appointments.insert_one({
+        "patientId": patient_id,
+        "patient": patient_info,
+        "doctorId": doctor_id,
+        "scheduleId": schedule_id,
+        "hospital": hospital,
+        "date": date,
+        "session": session,
+        "time": slot_time,
+        "createdAt": datetime.datetime.utcnow(),
+    })
+    await schedule_reminders(result.inserted_id, schedule_id, patient_id, hospital, date, slot_time)
+    await stats.count_booking(doctor_id, hospital, date, session, 1)
+
+
+async def release_slot(schedule_id, session, slot_time, patient_id):
+    """Free a booked slot if it still belongs to the patient. Returns True on success."""
+    slots_path = f"sessions.{session}.slots"
+    schedule = await doctor_availability.find_one_and_update(
+        {"_id": schedule_id, slots_path: {"$elemMatch": {"time": slot_time, "patientId": patient_id}}},
+        {
+            "$set": {
+                f"{slots_path}.$[s].available": True,
+                f"{slots_path}.$[s].patientId": None,
+            },
+            "$inc": {f"sessions.{session}.availableCount": 1},
+        },
+        array_filters=[{"s.time": slot_time, "s.patientId": patient_id}],
+        projection={"doctorId": 1, "hospital": 1, "date": 1},
+    )
+    appointment = await appointments.find_one_and_delete({
+        "scheduleId": schedule_id,
+        "session": session,
+        "time": slot_time,
+        "patientId": patient_id,
+    }, projection={"_id": 1})
+    if appointment:
+        await cancel_reminders(appointment_id=appointment["_id"])
+    if not schedule:
+        return False
+    availability.invalidate(schedule["hospital"], schedule["date"])
+    await stats.count_booking(schedule.get("doctorId"), schedule["hospital"], schedule["date"], session, -1)
+    return True
+
+
+async def find_week_appointment(patient_id, date):
+    """Return the patient's appointment in the Monday–Sunday week containing `date`, if any."""
+    week_start = date - datetime.timedelta(days=date.weekday())
+    week_end = week_start + datetime.timedelta(days=6)
+    return await appointments.find_one({
+        "patientId": patient_id,
+        "date": {"$gte": str(week_start), "$lte": str(week_end)},
+    })
+
+
+async def upcoming_appointments(patient_id):
+    cursor = appointments.find({
+        "patientId": patient_id,
+        "date": {"$gte": str(datetime.date.today())},
+    }).sort([("date", 1), ("time", 1)])
+    return await cursor.to_list(length=None)
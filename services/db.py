@@ -1,20 +1,96 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 import os
+import time
+from services.metrics import MongoCommandListener
 
 load_dotenv()
 
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["doctor_appointments"]
+# Connection pool sizing; tune per deployment via env vars.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "doctor_appointments")
+_client = None
+
+
+def get_client():
+    """Create the Motor client on first use so importing this module never touches the network."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            os.getenv("MONGO_URI"),
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            event_listeners=[MongoCommandListener()],
+        )
+    return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+class _LazyCollection:
+    """Stand-in that resolves the real collection the first time it is used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            self._collection = get_db()[self._name]
+        return getattr(self._collection, attr)
+
+
+doctor_availability = _LazyCollection("DoctorAvailability")
+appointments = _LazyCollection("Appointments")
+patients = _LazyCollection("Patients")
+bot_state = _LazyCollection("BotState")
+notifications = _LazyCollection("Notifications")
+reminders = _LazyCollection("Reminders")
+doctors = _LazyCollection("Doctors")
+waitlist = _LazyCollection("Waitlist")
+processed_updates = _LazyCollection("ProcessedUpdates")
+daily_stats = _LazyCollection("DailyStats")
+
+async def ensure_indexes():
+    await doctor_availability.create_index([("hospital", 1), ("date", 1)])
+    await doctor_availability.create_index([("doctorId", 1), ("hospital", 1), ("date", 1)])
+    # One schedule per doctor and day: /template's upserts and /schedule's insert rely on it.
+    # Schedules without a doctorId predate multi-doctor support and are left out.
+    await doctor_availability.create_index(
+        [("doctorId", 1), ("date", 1)], unique=True, partialFilterExpression={"doctorId": {"$type": "number"}},
+    )
+    await appointments.create_index([("patientId", 1), ("date", 1)])
+    await appointments.create_index([("hospital", 1), ("date", 1)])
+    await appointments.create_index("scheduleId")
+    await appointments.create_index([("doctorId", 1), ("date", 1)])
+    await bot_state.create_index([("kind", 1), ("name", 1)])
+    await reminders.create_index([("claimedBy", 1), ("dueAt", 1)])
+    await reminders.create_index("appointmentId")
+    await reminders.create_index("scheduleId")
+    await waitlist.create_index([("hospital", 1), ("status", 1), ("createdAt", 1)])
+    await waitlist.create_index([("status", 1), ("holdUntil", 1)])
+    await waitlist.create_index([("status", 1), ("claimedAt", 1)])
+    await processed_updates.create_index("expiresAt", expireAfterSeconds=0)
+    await daily_stats.create_index([("doctorId", 1), ("date", 1), ("hospital", 1), ("session", 1)], unique=True)
+    await daily_stats.create_index("date")
+
+
+async def ping():
+    """Round-trip a ping to MongoDB and return the elapsed milliseconds."""
+    started = time.perf_counter()
+    await get_db().command("ping")
+    return (time.perf_counter() - started) * 1000
 
-doctor_availability = db["DoctorAvailability"]
-appointments = db["Appointments"]
-patients = db["Patients"]
 
 # Optional test function to verify connection
-def test_connection():
+async def test_connection():
     try:
-        db.command("ping")
+        await get_db().command("ping")
         print("✅ MongoDB connection successful!")
     except Exception as e:
         print("❌ MongoDB connection failed:", e)
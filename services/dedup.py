@@ -0,0 +1,64 @@
+import datetime
+import time
+from collections import OrderedDict
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from services.db import processed_updates
+
+
+class UpdateDedup:
+    """Remembers recently accepted Telegram update ids so redeliveries are dropped.
+
+    The in-memory store is an insertion-ordered dict of update id -> expiry.
+    Every entry has the same TTL, so the oldest entry is always the first to
+    expire and both sweeping and LRU eviction pop from the front; lookups and
+    inserts are O(1) and memory is capped at `maxsize` ids.
+
+    With `shared=True` each update is also claimed in the ProcessedUpdates
+    collection (unique _id, TTL-indexed `expiresAt`) right before it is
+    processed, so several workers behind one webhook never handle the same
+    update twice.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600, shared=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._seen = OrderedDict()
+        self.evictions = 0
+
+    def _sweep(self, now):
+        while self._seen:
+            update_id, expires = next(iter(self._seen.items()))
+            if expires > now:
+                return
+            del self._seen[update_id]
+
+    def seen(self, update_id):
+        now = time.monotonic()
+        self._sweep(now)
+        return update_id in self._seen
+
+    def add(self, update_id):
+        self._seen[update_id] = time.monotonic() + self.ttl
+        while len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+            self.evictions += 1
+
+    async def claim(self, update_id):
+        """Shared mode: True if this worker is the first to claim the update. Always True otherwise."""
+        if not self.shared:
+            return True
+        try:
+            await processed_updates.insert_one({
+                "_id": update_id,
+                "expiresAt": datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl),
+            })
+        except DuplicateKeyError:
+            return False
+        except PyMongoError as e:
+            # Better to risk a duplicate than to drop an update because Mongo hiccuped.
+            print(f"Dedup claim for update {update_id} failed: {e}")
+        return True
+
+    def stats(self):
+        return {"size": len(self._seen), "maxsize": self.maxsize, "evictions": self.evictions, "shared": self.shared}
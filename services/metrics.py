@@ -0,0 +1,127 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Updates slower than this are recorded as traces; 0 disables tracing.
+SLOW_UPDATE_MS = float(os.getenv("SLOW_UPDATE_MS", 0))
+
+
+class Histogram:
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        # Mongo listener callbacks arrive on Motor's executor threads.
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {value: {**series, "buckets": list(series["buckets"])} for value, series in self._series.items()}
+        for value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+            lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+            lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+handler_latency = Histogram("bot_handler_seconds", "Time spent in each conversation handler.", "handler")
+update_latency = Histogram("bot_update_seconds", "End-to-end processing time per update.", "type")
+mongo_latency = Histogram("mongo_command_seconds", "MongoDB command round-trip time.", "command")
+
+_gauges = []
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+slow_traces = deque(maxlen=100)
+
+
+def register_gauge(name, help_text, fn, metric_type="gauge"):
+    """Expose the value returned by `fn()` on every scrape."""
+    _gauges.append((name, help_text, fn, metric_type))
+
+
+def _record_span(kind, name, seconds):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.append((kind, name, round(seconds * 1000, 2)))
+
+
+def timed(handler):
+    """Decorator recording a handler's latency under "<module>.<function>"."""
+    name = f"{handler.__module__.split('.')[-1]}.{handler.__name__}"
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            handler_latency.observe(name, elapsed)
+            _record_span("handler", name, elapsed)
+
+    return wrapper
+
+
+@asynccontextmanager
+async def trace_update(update):
+    """Time one update; when SLOW_UPDATE_MS is set, keep a span breakdown of slow ones."""
+    trace = [] if SLOW_UPDATE_MS else None
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_trace.reset(token)
+        update_latency.observe("callback_query" if update.callback_query else "message", elapsed)
+        if trace is not None and elapsed * 1000 >= SLOW_UPDATE_MS:
+            record = {"updateId": update.update_id, "ms": round(elapsed * 1000, 2), "spans": trace}
+            slow_traces.append(record)
+            print(f"🐢 Slow update {record['updateId']}: {record['ms']} ms {record['spans']}")
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_latency.observe(event.command_name, event.duration_micros / 1e6)
+        _record_span("mongo", event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_latency.observe(f"{event.command_name}_failed", event.duration_micros / 1e6)
+        _record_span("mongo", f"{event.command_name}_failed", event.duration_micros / 1e6)
+
+
+def render():
+    lines = []
+    for histogram in (handler_latency, update_latency, mongo_latency):
+        lines.extend(histogram.render())
+    for name, help_text, fn, metric_type in _gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {fn()}")
+    return "\n".join(lines) + "\n"
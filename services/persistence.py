@@ -0,0 +1,182 @@
+import asyncio
+import pickle
+from bson.binary import Binary
+from pymongo import DeleteOne, ReplaceOne
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput
+from services.db import bot_state
+
+
+class MongoPersistence(BasePersistence):
+    """Stores conversation states and user_data in MongoDB.
+
+    Writes are buffered in memory and flushed as one `bulk_write` either
+    `flush_delay` seconds after the first pending change or as soon as
+    `max_pending` documents are waiting, so a burst of updates costs a single
+    round-trip instead of one per user.
+
+    With `shared=True` the chat's conversation states and user_data are
+    re-read from Mongo before each update (`refresh`) and written through
+    right after it (`write_through`), so a worker picks up flows that another
+    worker advanced.
+    """
+
+    def __init__(self, update_interval=5, flush_delay=1.0, max_pending=500, shared=False):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.flush_delay = flush_delay
+        self.max_pending = max_pending
+        self.shared = shared
+        self._pending = {}
+        self._flush_task = None
+        self._limit_flushes = set()
+        self._lock = asyncio.Lock()
+
+    # -------------------- write-behind buffer --------------------
+
+    def _queue(self, doc_id, doc):
+        if doc is None:
+            self._pending[doc_id] = DeleteOne({"_id": doc_id})
+        else:
+            self._pending[doc_id] = ReplaceOne({"_id": doc_id}, doc, upsert=True)
+
+        if len(self._pending) >= self.max_pending:
+            # Keep a reference so the task is not garbage-collected mid-flush.
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._limit_flushes.add(task)
+            task.add_done_callback(self._limit_flushes.discard)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                await bot_state.bulk_write(list(pending.values()), ordered=False)
+            except Exception as e:
+                print(f"Persistence flush failed: {e}")
+                # Keep the failed writes unless a newer change superseded them meanwhile.
+                self._pending = {**pending, **self._pending}
+
+    # -------------------- user data --------------------
+
+    async def get_user_data(self):
+        data = {}
+        async for doc in bot_state.find({"kind": "user"}):
+            data[doc["userId"]] = pickle.loads(doc["data"])
+        return data
+
+    async def update_user_data(self, user_id, data):
+        self._queue(f"user:{user_id}", {
+            "kind": "user",
+            "userId": user_id,
+            "data": Binary(pickle.dumps(data)),
+        })
+
+    async def refresh_user_data(self, user_id, user_data):
+        # Shared mode reloads user_data in `refresh`, where PTB's unsaved changes are visible.
+        pass
+
+    async def drop_user_data(self, user_id):
+        self._queue(f"user:{user_id}", None)
+
+    # -------------------- conversations --------------------
+
+    async def get_conversations(self, name):
+        conversations = {}
+        async for doc in bot_state.find({"kind": "conversation", "name": name}):
+            conversations[tuple(doc["key"])] = doc["state"]
+        return conversations
+
+    @staticmethod
+    def _conversation_id(name, key):
+        return f"conv:{name}:{':'.join(map(str, key))}"
+
+    async def refresh(self, update, application):
+        """Shared mode: reload this chat's conversation states and user_data before the update is handled.
+
+        PTB reads persistence only once, at startup, so without this a worker
+        keeps acting on the last state it saw itself. Anything this worker
+        changed and has not written yet (still tracked by PTB or waiting in
+        the buffer) is newer and is left alone.
+        """
+        if not self.shared or not update.effective_chat or not update.effective_user:
+            return
+        user_id = update.effective_user.id
+        key = (update.effective_chat.id, user_id)
+        handlers = {
+            self._conversation_id(handler.name, key): handler
+            for group in application.handlers.values()
+            for handler in group
+            if isinstance(handler, ConversationHandler) and handler.persistent
+        }
+        user_doc_id = f"user:{user_id}"
+        stored = {
+            doc["_id"]: doc
+            async for doc in bot_state.find({"_id": {"$in": [user_doc_id, *handlers]}}, {"state": 1, "data": 1})
+        }
+
+        for doc_id, handler in handlers.items():
+            if doc_id in self._pending or key in handler._conversations._write_access_keys:
+                continue
+            # Write around PTB's change tracking so the reloaded state is not persisted again.
+            if doc_id in stored:
+                handler._conversations.update_no_track({key: stored[doc_id]["state"]})
+            else:
+                handler._conversations.data.pop(key, None)
+
+        unsaved = user_doc_id in self._pending or user_id in application._user_ids_to_be_updated_in_persistence
+        if user_doc_id in stored and not unsaved:
+            user_data = application.user_data[user_id]
+            user_data.clear()
+            user_data.update(pickle.loads(stored[user_doc_id]["data"]))
+
+    async def write_through(self, application):
+        """Shared mode: hand this update's changes to Mongo now instead of after `update_interval` and `flush_delay`."""
+        if not self.shared:
+            return
+        await application.update_persistence()
+        await self.flush()
+
+    async def update_conversation(self, name, key, new_state):
+        doc_id = self._conversation_id(name, key)
+        if new_state is None:
+            self._queue(doc_id, None)
+        else:
+            self._queue(doc_id, {"kind": "conversation", "name": name, "key": list(key), "state": new_state})
+
+    # -------------------- unused kinds --------------------
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
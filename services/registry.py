@@ -0,0 +1,56 @@
+from services.db import doctors
+
+DEFAULT_HOSPITALS = ["Abet Hospital", "Ethio Tebib Hospital", "Girum Hospital"]
+
+
+class Registry:
+    """In-memory copy of the Doctors collection.
+
+    Handlers check doctors and list hospitals on every update, so lookups
+    are plain dict/list reads; `load` refreshes the copy from Mongo at
+    startup and on every warm-up.
+    """
+
+    def __init__(self):
+        self._doctors = {}
+        self._by_hospital = {}
+        self._hospital_keys = {}
+
+    async def load(self, bootstrap_doctor_id=None):
+        """Reload the registry. A bootstrap doctor is created with the default hospitals if missing."""
+        if bootstrap_doctor_id:
+            await doctors.update_one(
+                {"_id": bootstrap_doctor_id},
+                {"$setOnInsert": {"name": "Doctor", "hospitals": DEFAULT_HOSPITALS}},
+                upsert=True,
+            )
+
+        loaded = {doc["_id"]: doc async for doc in doctors.find({})}
+        by_hospital = {}
+        for doctor_id, doc in loaded.items():
+            for hospital in doc.get("hospitals", []):
+                by_hospital.setdefault(hospital, []).append(doctor_id)
+        self._doctors, self._by_hospital = loaded, by_hospital
+        self._hospital_keys = {" ".join(h.split()).lower(): h for h in by_hospital}
+
+    def is_doctor(self, user_id):
+        return user_id in self._doctors
+
+    def doctor_ids(self):
+        return list(self._doctors)
+
+    def doctor_name(self, doctor_id):
+        return self._doctors.get(doctor_id, {}).get("name", "Doctor")
+
+    def hospitals(self, doctor_id=None):
+        """Hospitals of one doctor, or every hospital with at least one doctor."""
+        if doctor_id is not None:
+            return self._doctors.get(doctor_id, {}).get("hospitals", [])
+        return sorted(self._by_hospital)
+
+    def hospital_named(self, key):
+        """Canonical name for a lower-cased, whitespace-collapsed hospital name."""
+        return self._hospital_keys.get(key)
+
+
+registry = Registry()
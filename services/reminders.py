@@ -0,0 +1,75 @@
+import datetime
+import os
+import uuid
+from zoneinfo import ZoneInfo
+from pymongo import ASCENDING
+from services.db import reminders
+from services.scheduler import notifier
+
+REMINDER_OFFSETS = [datetime.timedelta(hours=24), datetime.timedelta(hours=1)]
+BATCH_SIZE = 200
+# Slot times are clinic wall-clock times; the server may run in any zone (UTC on Render).
+CLINIC_TZ = ZoneInfo(os.getenv("CLINIC_TZ", "Africa/Addis_Ababa"))
+
+
+def slot_time_utc(date, slot_time):
+    """Naive UTC datetime of a clinic-local slot, the form Mongo stores."""
+    local = datetime.datetime.strptime(f"{date} {slot_time}", "%Y-%m-%d %H:%M").replace(tzinfo=CLINIC_TZ)
+    return local.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+async def schedule_reminders(appointment_id, schedule_id, patient_id, hospital, date, slot_time):
+    slot_at = slot_time_utc(date, slot_time)
+    now = datetime.datetime.utcnow()
+    docs = [
+        {
+            "dueAt": slot_at - offset,
+            "appointmentId": appointment_id,
+            "scheduleId": schedule_id,
+            "patientId": patient_id,
+            "text": f"⏰ Reminder: your appointment at {hospital} is on {date} at {slot_time}.",
+            "claimedBy": None,
+        }
+        for offset in REMINDER_OFFSETS if slot_at - offset > now
+    ]
+    if docs:
+        await reminders.insert_many(docs)
+
+
+async def cancel_reminders(appointment_id=None, schedule_id=None):
+    if appointment_id is not None:
+        await reminders.delete_many({"appointmentId": appointment_id})
+    if schedule_id is not None:
+        await reminders.delete_many({"scheduleId": schedule_id})
+
+
+async def dispatch_due_reminders():
+    """Hand every due reminder to the notifier, claiming them in batches.
+
+    A batch is claimed with a unique token before sending so that two workers
+    running this job never deliver the same reminder twice.
+    """
+    sent = 0
+    while True:
+        now = datetime.datetime.utcnow()
+        due = await reminders.find(
+            {"dueAt": {"$lte": now}, "claimedBy": None}, {"_id": 1}
+        ).sort("dueAt", ASCENDING).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not due:
+            break
+
+        token = uuid.uuid4().hex
+        await reminders.update_many(
+            {"_id": {"$in": [d["_id"] for d in due]}, "claimedBy": None},
+            {"$set": {"claimedBy": token}},
+        )
+        async for reminder in reminders.find({"claimedBy": token}, {"patientId": 1, "text": 1}):
+            notifier.notify(reminder["patientId"], reminder["text"])
+            sent += 1
+        await reminders.delete_many({"claimedBy": token})
+
+        if len(due) < BATCH_SIZE:
+            break
+
+    if sent:
+        print(f"⏰ Queued {sent} reminders.")
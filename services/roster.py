@@ -0,0 +1,78 @@
+import csv
+import io
+import tempfile
+from services.db import appointments, patients
+
+LOOKUP_BATCH = 200
+# Rosters stay in memory up to this size and spill to a temp file beyond it.
+SPOOL_MAX_BYTES = 1024 * 1024
+
+COLUMNS = ["date", "hospital", "session", "time", "name", "age", "sex", "phone", "reason"]
+# Spreadsheets run a cell starting with one of these as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    """Patient-typed text, made inert for Excel and Sheets."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def patient_details(batch):
+    """The visit details of each appointment in `batch`, in order.
+
+    Appointments carry their own details; ones booked before that was the
+    case fall back to the per-account Patients document.
+    """
+    legacy = list({appt["patientId"] for appt in batch if not appt.get("patient")})
+    info_by_id = {
+        p["_id"]: p async for p in patients.find({"_id": {"$in": legacy}}, {"name": 1, "age": 1, "sex": 1, "phone": 1, "reason": 1})
+    } if legacy else {}
+    return [appt.get("patient") or info_by_id.get(appt["patientId"], {}) for appt in batch]
+
+
+async def _write_batch(writer, batch):
+    for appt, info in zip(batch, await patient_details(batch)):
+        writer.writerow([
+            appt["date"], appt["hospital"], appt["session"], appt["time"],
+            _cell(info.get("name")), info.get("age"), info.get("sex"), info.get("phone"), _cell(info.get("reason")),
+        ])
+
+
+async def export_roster_csv(doctor_id, start, end):
+    """Write every appointment of one doctor between two dates (inclusive) into a CSV file.
+
+    Appointments are read with a projected cursor and patient details are
+    fetched LOOKUP_BATCH at a time, so building the file does not hold all
+    appointments in memory; the file itself spills to disk past SPOOL_MAX_BYTES.
+    Sending it is not streamed: python-telegram-bot reads the whole file into
+    memory for the upload, so the finished CSV's size is still held once.
+    Returns (binary file positioned at 0, row count).
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+
+    cursor = appointments.find(
+        {"doctorId": doctor_id, "date": {"$gte": str(start), "$lte": str(end)}},
+        {"_id": 0, "date": 1, "hospital": 1, "session": 1, "time": 1, "patientId": 1, "patient": 1},
+        batch_size=LOOKUP_BATCH,
+    ).sort([("date", 1), ("time", 1)])
+
+    rows, batch = 0, []
+    async for appt in cursor:
+        batch.append(appt)
+        if len(batch) >= LOOKUP_BATCH:
+            await _write_batch(writer, batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        await _write_batch(writer, batch)
+        rows += len(batch)
+
+    text.flush()
+    text.detach()
+    buffer.seek(0)
+    return buffer, rows
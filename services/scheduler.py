@@ -0,0 +1,95 @@
+import asyncio
+import datetime
+import time
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from services.db import notifications
+
+
+class Notifier:
+    """Queues outgoing patient messages and sends them in the background.
+
+    Sending stays within Telegram's limits: at most `global_rate` messages per
+    second overall and one message per `per_chat_interval` seconds to the
+    same chat. RetryAfter (HTTP 429) waits the time Telegram asks for and
+    other transient errors back off exponentially, both for at most
+    `max_retries` attempts. The final outcome of every message is recorded in the Notifications collection.
+    """
+
+    def __init__(self, global_rate=25, per_chat_interval=1.0, workers=8, max_retries=5):
+        self.global_interval = 1 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bot = None
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._next_global = 0.0
+        self._next_chat = {}
+        self._rate_lock = asyncio.Lock()
+
+    def notify(self, chat_id, text, **kwargs):
+        """Queue a message; returns immediately."""
+        self._queue.put_nowait({"chat_id": chat_id, "text": text, "kwargs": kwargs, "attempts": 0})
+
+    async def _wait_for_slot(self, chat_id):
+        async with self._rate_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_global, self._next_chat.get(chat_id, 0.0))
+            self._next_global = send_at + self.global_interval
+            self._next_chat[chat_id] = send_at + self.per_chat_interval
+            if len(self._next_chat) > 10000:
+                self._next_chat = {c: t for c, t in self._next_chat.items() if t > now}
+        await asyncio.sleep(send_at - time.monotonic())
+
+    async def _send(self, message):
+        while True:
+            message["attempts"] += 1
+            await self._wait_for_slot(message["chat_id"])
+            try:
+                await self.bot.send_message(chat_id=message["chat_id"], text=message["text"], **message["kwargs"])
+                return "sent", None
+            except RetryAfter as e:
+                if message["attempts"] >= self.max_retries:
+                    return "failed", str(e)
+                delay = e.retry_after
+            except (Forbidden, BadRequest) as e:
+                return "failed", str(e)
+            except TelegramError as e:
+                delay = 2 ** message["attempts"]
+                if message["attempts"] >= self.max_retries:
+                    return "failed", str(e)
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                status, error = await self._send(message)
+                await notifications.insert_one({
+                    "chatId": message["chat_id"],
+                    "text": message["text"],
+                    "status": status,
+                    "error": error,
+                    "attempts": message["attempts"],
+                    "finishedAt": datetime.datetime.utcnow(),
+                })
+            except Exception as e:
+                print(f"Notification to {message['chat_id']} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def start(self, bot):
+        self.bot = bot
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def pending(self):
+        return self._queue.qsize()
+
+
+notifier = Notifier()
@@ -0,0 +1,100 @@
+import datetime
+from pymongo import UpdateOne
+from services.db import daily_stats, doctor_availability
+
+# One DailyStats document per (doctorId, date, hospital, session):
+#   {total, booked, week}  — `week` is the Monday of the date's week.
+# Counters are kept up to date on schedule creation, booking and cancellation,
+# so utilization over any range is an indexed read instead of a slot scan.
+
+
+def week_start(date):
+    date = datetime.date.fromisoformat(str(date))
+    return str(date - datetime.timedelta(days=date.weekday()))
+
+
+def default_range():
+    """This week and the three after it."""
+    start = datetime.date.fromisoformat(week_start(datetime.date.today()))
+    return start, start + datetime.timedelta(days=27)
+
+
+def _key(doctor_id, hospital, date, session):
+    return {"doctorId": doctor_id, "date": str(date), "hospital": hospital, "session": session}
+
+
+async def record_schedule(doctor_id, hospital, date, sessions):
+    """Set slot totals for a newly created schedule."""
+    ops = [
+        UpdateOne(_key(doctor_id, hospital, date, name), {
+            "$set": {"total": len(session["slots"]), "week": week_start(date)},
+            "$setOnInsert": {"booked": 0},
+        }, upsert=True)
+        for name, session in sessions.items()
+    ]
+    if ops:
+        await daily_stats.bulk_write(ops, ordered=False)
+
+
+async def remove_schedule(doctor_id, date):
+    await daily_stats.delete_many({"doctorId": doctor_id, "date": str(date)})
+
+
+async def count_booking(doctor_id, hospital, date, session, delta):
+    await daily_stats.update_one(
+        _key(doctor_id, hospital, date, session),
+        {"$inc": {"booked": delta}, "$setOnInsert": {"week": week_start(date)}},
+        upsert=True,
+    )
+
+
+async def utilization(start, end, doctor_id=None):
+    """Booked/total slots per week, hospital and session between two dates (inclusive)."""
+    match = {"date": {"$gte": str(start), "$lte": str(end)}}
+    if doctor_id is not None:
+        match["doctorId"] = doctor_id
+    rows = await daily_stats.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"week": "$week", "hospital": "$hospital", "session": "$session"},
+            "total": {"$sum": "$total"},
+            "booked": {"$sum": "$booked"},
+        }},
+        {"$sort": {"_id.week": 1, "_id.hospital": 1, "_id.session": 1}},
+    ]).to_list(length=None)
+    return [{**row["_id"], "booked": row["booked"], "total": row["total"]} for row in rows]
+
+
+async def rebuild(doctor_id=None):
+    """Recompute DailyStats from DoctorAvailability server-side (needs MongoDB 5.0+ for $dateTrunc).
+
+    $merge cannot match on a missing doctorId, so schedules created before
+    multi-doctor support are skipped until `register_doctor --claim-unassigned`
+    assigns them.
+    """
+    match = {"doctorId": {"$type": "number"} if doctor_id is None else doctor_id}
+    await doctor_availability.aggregate([
+        {"$match": match},
+        {"$project": {"doctorId": 1, "hospital": 1, "date": 1, "sessions": {"$objectToArray": "$sessions"}}},
+        {"$unwind": "$sessions"},
+        {"$project": {
+            "_id": 0,
+            "doctorId": 1,
+            "hospital": 1,
+            "date": 1,
+            "session": "$sessions.k",
+            "total": {"$size": "$sessions.v.slots"},
+            "booked": {"$size": {"$filter": {
+                "input": "$sessions.v.slots", "as": "s", "cond": {"$gt": ["$$s.patientId", None]},
+            }}},
+            "week": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$dateTrunc": {
+                "date": {"$dateFromString": {"dateString": "$date"}}, "unit": "week", "startOfWeek": "monday",
+            }}}},
+        }},
+        {"$merge": {
+            "into": "DailyStats",
+            "on": ["doctorId", "date", "hospital", "session"],
+            "whenMatched": "merge",
+            "whenNotMatched": "insert",
+        }},
+    ]).to_list(length=None)
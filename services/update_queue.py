@@ -0,0 +1,79 @@
+import asyncio
+from services.dedup import UpdateDedup
+
+
+class UpdateQueue:
+    """Bounded queue that lets the webhook acknowledge Telegram immediately.
+
+    Updates are sharded by chat id over `workers` queues, each drained by a
+    single task, so updates from one chat are processed in order while
+    different chats run concurrently. Update ids already accepted are
+    remembered in `dedup` so Telegram retries are dropped, and claimed again
+    right before processing when the dedup store is shared between workers.
+    """
+
+    def __init__(self, process, workers=4, maxsize=1000, dedup=None):
+        self.process = process
+        self.shards = [asyncio.Queue(maxsize=max(1, maxsize // workers)) for _ in range(workers)]
+        self.dedup = dedup or UpdateDedup()
+        self._tasks = []
+        self.processed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, update):
+        """Enqueue an update. Returns "queued", "duplicate" or "full"."""
+        if self.dedup.seen(update.update_id):
+            self.duplicates += 1
+            return "duplicate"
+
+        chat = update.effective_chat
+        key = chat.id if chat else update.update_id
+        try:
+            self.shards[key % len(self.shards)].put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return "full"
+
+        self.dedup.add(update.update_id)
+        return "queued"
+
+    async def _worker(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                if not await self.dedup.claim(update.update_id):
+                    self.duplicates += 1
+                    continue
+                await self.process(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Update {update.update_id} failed: {e}")
+            finally:
+                queue.task_done()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self.shards]
+
+    async def stop(self):
+        """Drain what is already queued, then stop the workers."""
+        await asyncio.gather(*(queue.join() for queue in self.shards))
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def depth(self):
+        return sum(queue.qsize() for queue in self.shards)
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "capacity": sum(queue.maxsize for queue in self.shards),
+            "processed": self.processed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "dedup": self.dedup.stats(),
+        }
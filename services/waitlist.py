@@ -0,0 +1,218 @@
+import datetime
+import os
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from services.db import doctor_availability, waitlist
+from services import availability
+from services.booking import record_appointment, find_week_appointment
+from services.scheduler import notifier
+
+HOLD_MINUTES = int(os.getenv("WAITLIST_HOLD_MINUTES", 30))
+# An entry still "offering" after this long belongs to a worker that died mid-offer.
+OFFERING_TIMEOUT = datetime.timedelta(minutes=5)
+SESSION_NAMES = ("morning", "afternoon")
+
+# Entry lifecycle: waiting -> offering -> offered -> booked | declined | expired | lapsed.
+# offering and offered become closed when the patient already has an appointment that week;
+# a stale offering goes back to waiting.
+
+
+async def join(patient_id, hospital, date_from, date_to, patient_info):
+    """Put the patient on the waitlist for any slot at `hospital` between two dates.
+
+    `patient_info` is the visit's details; it becomes part of the appointment if an offer is accepted.
+    """
+    await waitlist.update_one(
+        {"patientId": patient_id, "hospital": hospital, "status": "waiting"},
+        {
+            "$set": {"dateFrom": str(date_from), "dateTo": str(date_to), "patient": patient_info},
+            "$setOnInsert": {"createdAt": datetime.datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+
+async def _hold_slot(schedule_id, patient_id):
+    """Atomically take the first free slot of the schedule out of circulation for one patient."""
+    for session in SESSION_NAMES:
+        slots_path = f"sessions.{session}.slots"
+        before = await doctor_availability.find_one_and_update(
+            {"_id": schedule_id, f"{slots_path}.available": True},
+            {
+                "$set": {f"{slots_path}.$.available": False, f"{slots_path}.$.heldFor": patient_id},
+                "$inc": {f"sessions.{session}.availableCount": -1},
+            },
+            projection={f"{slots_path}.time": 1, f"{slots_path}.available": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before:
+            slot_time = next(s["time"] for s in before["sessions"][session]["slots"] if s["available"])
+            return session, slot_time
+    return None, None
+
+
+async def _release_hold(entry):
+    slots_path = f"sessions.{entry['session']}.slots"
+    schedule = await doctor_availability.find_one_and_update(
+        {"_id": entry["scheduleId"], slots_path: {"$elemMatch": {"time": entry["time"], "heldFor": entry["patientId"]}}},
+        {
+            "$set": {f"{slots_path}.$[s].available": True, f"{slots_path}.$[s].heldFor": None},
+            "$inc": {f"sessions.{entry['session']}.availableCount": 1},
+        },
+        array_filters=[{"s.time": entry["time"], "s.heldFor": entry["patientId"]}],
+        projection={"hospital": 1, "date": 1},
+    )
+    if schedule:
+        availability.invalidate(schedule["hospital"], schedule["date"])
+
+
+async def _release_any_hold(schedule_id, patient_id):
+    """Free a slot of the schedule held for the patient by an offer that was never recorded."""
+    schedule = None
+    for session in SESSION_NAMES:
+        slots_path = f"sessions.{session}.slots"
+        schedule = await doctor_availability.find_one_and_update(
+            {"_id": schedule_id, slots_path: {"$elemMatch": {"heldFor": patient_id, "patientId": None}}},
+            {
+                "$set": {f"{slots_path}.$.available": True, f"{slots_path}.$.heldFor": None},
+                "$inc": {f"sessions.{session}.availableCount": 1},
+            },
+            projection={"hospital": 1, "date": 1},
+        ) or schedule
+    if schedule:
+        availability.invalidate(schedule["hospital"], schedule["date"])
+
+
+async def offer_freed_slots(schedule_id):
+    """Offer every free slot of a schedule to waiting patients, oldest first."""
+    schedule = await doctor_availability.find_one({"_id": schedule_id}, {"hospital": 1, "date": 1, "doctorId": 1})
+    if not schedule:
+        return
+    date = datetime.datetime.strptime(schedule["date"], "%Y-%m-%d").date()
+
+    while True:
+        entry = await waitlist.find_one_and_update(
+            {
+                "hospital": schedule["hospital"],
+                "status": "waiting",
+                "dateFrom": {"$lte": schedule["date"]},
+                "dateTo": {"$gte": schedule["date"]},
+            },
+            {"$set": {"status": "offering", "claimedAt": datetime.datetime.utcnow(), "scheduleId": schedule_id}},
+            sort=[("createdAt", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if not entry:
+            return
+
+        if await find_week_appointment(entry["patientId"], date):
+            await waitlist.update_one({"_id": entry["_id"]}, {"$set": {"status": "closed"}})
+            continue
+
+        session, slot_time = await _hold_slot(schedule_id, entry["patientId"])
+        if not slot_time:
+            await waitlist.update_one({"_id": entry["_id"]}, {"$set": {"status": "waiting"}})
+            return
+        availability.invalidate(schedule["hospital"], schedule["date"])
+
+        hold_until = datetime.datetime.utcnow() + datetime.timedelta(minutes=HOLD_MINUTES)
+        await waitlist.update_one({"_id": entry["_id"]}, {"$set": {
+            "status": "offered",
+            "doctorId": schedule.get("doctorId"),
+            "scheduleId": schedule_id,
+            "date": schedule["date"],
+            "session": session,
+            "time": slot_time,
+            "holdUntil": hold_until,
+        }})
+        notifier.notify(
+            entry["patientId"],
+            f"🔔 A slot opened up!\n🏥 {schedule['hospital']}\n📅 {schedule['date']}\n🕓 {slot_time}\n"
+            f"It is held for you for {HOLD_MINUTES} minutes.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("✅ Book it", callback_data=f"wa:{entry['_id']}"),
+                InlineKeyboardButton("❌ No thanks", callback_data=f"wd:{entry['_id']}"),
+            ]]),
+        )
+
+
+async def accept(entry_id, patient_id):
+    """Turn a held slot into a booking. Returns the waitlist entry, or None if the offer lapsed.
+
+    An offer for a week in which the patient already has an appointment is
+    closed and its slot passed on to the next patient.
+    """
+    entry = await waitlist.find_one_and_update(
+        {
+            "_id": ObjectId(entry_id),
+            "patientId": patient_id,
+            "status": "offered",
+            "holdUntil": {"$gt": datetime.datetime.utcnow()},
+        },
+        {"$set": {"status": "booked"}},
+    )
+    if not entry:
+        return None
+
+    # The patient may have booked elsewhere in that week since the offer went out.
+    if await find_week_appointment(patient_id, datetime.datetime.strptime(entry["date"], "%Y-%m-%d").date()):
+        await waitlist.update_one({"_id": entry["_id"]}, {"$set": {"status": "closed"}})
+        await _release_hold(entry)
+        await offer_freed_slots(entry["scheduleId"])
+        return None
+
+    slots_path = f"sessions.{entry['session']}.slots"
+    result = await doctor_availability.update_one(
+        {"_id": entry["scheduleId"]},
+        {"$set": {f"{slots_path}.$[s].patientId": patient_id, f"{slots_path}.$[s].heldFor": None}},
+        array_filters=[{"s.time": entry["time"], "s.heldFor": patient_id}],
+    )
+    if not result.modified_count:
+        # The schedule was overwritten or deleted while the offer was open.
+        await waitlist.update_one({"_id": entry["_id"]}, {"$set": {"status": "lapsed"}})
+        return None
+
+    await record_appointment(
+        entry.get("doctorId"), entry["scheduleId"], entry["hospital"], entry["date"],
+        entry["session"], entry["time"], patient_id, entry.get("patient", {}),
+    )
+    return entry
+
+
+async def decline(entry_id, patient_id):
+    entry = await waitlist.find_one_and_update(
+        {"_id": ObjectId(entry_id), "patientId": patient_id, "status": "offered"},
+        {"$set": {"status": "declined"}},
+    )
+    if entry:
+        await _release_hold(entry)
+        await offer_freed_slots(entry["scheduleId"])
+
+
+async def expire_holds():
+    """Scheduler job: release holds nobody answered and pass the slot on.
+
+    Offers a crashed worker left half-made go back on the waitlist, and any
+    slot they already held is offered again.
+    """
+    while True:
+        entry = await waitlist.find_one_and_update(
+            {"status": "offered", "holdUntil": {"$lte": datetime.datetime.utcnow()}},
+            {"$set": {"status": "expired"}},
+        )
+        if not entry:
+            break
+        await _release_hold(entry)
+        notifier.notify(entry["patientId"], "⌛ Your held slot has expired and was offered to the next patient.")
+        await offer_freed_slots(entry["scheduleId"])
+
+    while True:
+        entry = await waitlist.find_one_and_update(
+            {"status": "offering", "claimedAt": {"$lte": datetime.datetime.utcnow() - OFFERING_TIMEOUT}},
+            {"$set": {"status": "waiting"}, "$unset": {"claimedAt": "", "scheduleId": ""}},
+        )
+        if not entry:
+            return
+        await _release_any_hold(entry["scheduleId"], entry["patientId"])
+        await offer_freed_slots(entry["scheduleId"])
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from services import db
+from services.availability import availability_cache
+
+# Tests that need real MongoDB semantics (positional updates, array_filters,
+# unique indexes) run against a local mongod and are skipped without one:
+#   MONGO_TEST_URI=mongodb://localhost:27017 python -m pytest
+# mongomock is no substitute: it applies the nested positional `$` to the wrong slot.
+# Set MONGO_TEST_REQUIRED=1 (e.g. in CI before merging) to fail instead of skipping.
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+MONGO_TEST_REQUIRED = os.getenv("MONGO_TEST_REQUIRED", "").lower() in ("1", "true")
+
+
+def _reset_collections():
+    for value in vars(db).values():
+        if isinstance(value, db._LazyCollection):
+            value._collection = None
+
+
+@pytest.fixture
+def mongo_run(monkeypatch):
+    """Run a coroutine function against a freshly indexed, throwaway database."""
+    if not MONGO_TEST_URI:
+        if MONGO_TEST_REQUIRED:
+            pytest.fail("MONGO_TEST_REQUIRED is set but MONGO_TEST_URI is not")
+        pytest.skip("set MONGO_TEST_URI to run tests against a local mongod")
+    name = f"doctor_appointments_test_{os.getpid()}"
+    monkeypatch.setattr(db, "MONGO_DB_NAME", name)
+
+    def run(test):
+        async def main():
+            # Motor clients are tied to the event loop they were created on.
+            db._client = AsyncIOMotorClient(MONGO_TEST_URI)
+            _reset_collections()
+            availability_cache.clear()
+            await db._client.drop_database(name)
+            await db.ensure_indexes()
+            try:
+                return await test()
+            finally:
+                await db._client.drop_database(name)
+                db._client.close()
+                db._client = None
+                _reset_collections()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def bot_app(monkeypatch):
+    """Build an offline Application (FakeBot, in-memory persistence) with the given handlers registered.
+
+    Any database access fails the test.
+    """
+    from telegram.ext import ApplicationBuilder, DictPersistence
+    from scripts.fake_telegram import FakeBot
+
+    def no_database():
+        raise AssertionError("handler touched the database")
+
+    _reset_collections()
+    monkeypatch.setattr(db, "get_db", no_database)
+
+    async def build(*register):
+        app = ApplicationBuilder().bot(FakeBot("1:test")).persistence(DictPersistence()).build()
+        for register_handler in register:
+            register_handler(app)
+        await app.initialize()
+        return app
+
+    return build
+
+
+@pytest.fixture
+def doctors(monkeypatch):
+    """Fill the registry with two doctors without reading the Doctors collection."""
+    from services.registry import registry
+
+    loaded = {
+        9001: {"_id": 9001, "name": "Dr. Abebe", "hospitals": ["Abet Hospital", "Girum Hospital"]},
+        9002: {"_id": 9002, "name": "Dr. Sara", "hospitals": ["Ethio Tebib Hospital"]},
+    }
+    by_hospital = {}
+    for doctor_id, doc in loaded.items():
+        for hospital in doc["hospitals"]:
+            by_hospital.setdefault(hospital, []).append(doctor_id)
+    monkeypatch.setattr(registry, "_doctors", loaded)
+    monkeypatch.setattr(registry, "_by_hospital", by_hospital)
+    monkeypatch.setattr(registry, "_hospital_keys", {h.lower(): h for h in by_hospital})
+    return loaded
@@ -0,0 +1,57 @@
+import asyncio
+import datetime
+import pytest
+from telegram import Update
+from handlers.admin import (
+    register_schedule_handler, HOSPITAL, DAY, SESSION, VIEW_DAY, TEMPLATE_PATTERN, TEMPLATE_WEEKS, MAX_TEMPLATE_WEEKS,
+)
+from scripts.fake_telegram import message_update
+
+DOCTOR_ID = 9001
+SCHEDULING = {"hospital": "Abet Hospital", "day": "Monday", "selected_date": datetime.date.today()}
+
+
+@pytest.mark.parametrize("name, state, text, reply", [
+    # Another doctor's hospital is not offered to this one.
+    ("schedule", HOSPITAL, "Ethio Tebib Hospital", "❌ Please choose one of your hospitals:"),
+    ("schedule", DAY, "Funday", "❌ Please select a day from the list."),
+    ("schedule", SESSION, "Evening", "❌ Please select a session from the list."),
+    ("template", TEMPLATE_PATTERN, "Abet Hospital, Monday", "❌ Could not understand: Abet Hospital, Monday\n"
+                                                           "Please send the pattern again or /cancel."),
+    ("template", TEMPLATE_PATTERN, "Abet Hospital, Monday, Morning\nGirum Hospital, Mon, Both",
+     "❌ Monday appears more than once.\nPlease send the pattern again or /cancel."),
+    ("template", TEMPLATE_WEEKS, str(MAX_TEMPLATE_WEEKS + 1),
+     f"❌ Please enter a number of weeks between 1 and {MAX_TEMPLATE_WEEKS}."),
+    ("template", TEMPLATE_WEEKS, "four", f"❌ Please enter a number of weeks between 1 and {MAX_TEMPLATE_WEEKS}."),
+    ("view_patients", VIEW_DAY, "someday", "Invalid day. Please select from the list."),
+])
+def test_invalid_answers_are_reprompted_without_touching_the_database(bot_app, doctors, name, state, text, reply):
+    async def scenario():
+        app = await bot_app(register_schedule_handler)
+        conversation = next(h for h in app.handlers[0] if getattr(h, "name", None) == name)
+        conversation._conversations[(DOCTOR_ID, DOCTOR_ID)] = state
+        app.user_data[DOCTOR_ID].update(SCHEDULING)
+
+        await app.process_update(Update.de_json(message_update(DOCTOR_ID, text), app.bot))
+
+        assert conversation._conversations.get((DOCTOR_ID, DOCTOR_ID)) == state
+        assert app.bot.texts[DOCTOR_ID] == reply
+        await app.shutdown()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("command, args, reply", [
+    ("roster", "2026-13-01", "Usage: /roster [YYYY-MM-DD] [YYYY-MM-DD]"),
+    ("stats", "next week", "Usage: /stats [YYYY-MM-DD] [YYYY-MM-DD]"),
+    ("roster", "2026-10-20 2026-10-19", "❌ The end date must not be before the start date."),
+    ("stats", "2026-10-20 2026-10-19", "❌ The end date must not be before the start date."),
+])
+def test_invalid_date_arguments_are_rejected_without_touching_the_database(bot_app, doctors, command, args, reply):
+    async def scenario():
+        app = await bot_app(register_schedule_handler)
+        await app.process_update(Update.de_json(message_update(DOCTOR_ID, f"/{command} {args}"), app.bot))
+        assert app.bot.texts[DOCTOR_ID] == reply
+        await app.shutdown()
+
+    asyncio.run(scenario())
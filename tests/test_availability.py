@@ -0,0 +1,99 @@
+import asyncio
+import datetime
+import pytest
+from services import availability
+from services.cache import TTLCache
+
+HOSPITAL = "Abet Hospital"
+DOCTOR_ID = 1
+DATE = datetime.date.today() + datetime.timedelta(days=2)
+
+
+class StubCollection:
+    """Stands in for DoctorAvailability; `gate` holds aggregate results back until it is set."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.gate = None
+        self.calls = 0
+
+    def aggregate(self, pipeline):
+        self.calls += 1
+        return self._cursor(list(self.docs))
+
+    async def _cursor(self, docs):
+        if self.gate is not None:
+            await self.gate.wait()
+        for doc in docs:
+            yield doc
+
+
+def summary(morning_free):
+    return {"doctorId": DOCTOR_ID, "date": str(DATE), "sessions": [{"name": "morning", "available": morning_free}]}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    availability.availability_cache.clear()
+    collection = StubCollection([summary(1)])
+    monkeypatch.setattr(availability, "doctor_availability", collection)
+    yield collection
+    availability.availability_cache.clear()
+
+
+def test_booking_during_a_slow_read_is_never_served_as_available(stub):
+    async def scenario():
+        stub.gate = asyncio.Event()
+        read = asyncio.create_task(availability.week_availability(HOSPITAL, DATE, days=1))
+        await asyncio.sleep(0)
+
+        # The last free slot is booked and invalidated while the read is still in flight.
+        stub.docs = [summary(0)]
+        availability.invalidate(HOSPITAL, str(DATE))
+        stub.gate.set()
+        assert await read == [(DATE, DOCTOR_ID, ["morning"])]
+
+        # The stale result must not have been cached: the next read goes back to the database.
+        assert await availability.day_availability(HOSPITAL, str(DATE), DOCTOR_ID) == []
+        assert stub.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_reads_are_served_from_cache_until_invalidated(stub):
+    async def scenario():
+        assert await availability.day_availability(HOSPITAL, str(DATE), DOCTOR_ID) == ["morning"]
+        assert await availability.day_availability(HOSPITAL, str(DATE), DOCTOR_ID) == ["morning"]
+        assert stub.calls == 1
+
+        stub.docs = [summary(0)]
+        availability.invalidate(HOSPITAL, str(DATE))
+        assert await availability.day_availability(HOSPITAL, str(DATE), DOCTOR_ID) == []
+        assert stub.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_ttl_cache_rejects_writes_from_an_older_generation():
+    cache = TTLCache(maxsize=10, ttl=60)
+    generation = cache.generation("k")
+    cache.invalidate("k")
+    cache.set("k", "stale", generation)
+    assert cache.get("k") is None
+
+    cache.set("k", "fresh", cache.generation("k"))
+    assert cache.get("k") == "fresh"
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.evictions == 1
+
+    now[0] += 31
+    assert cache.get("a") is None and cache.get("c") is None
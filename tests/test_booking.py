@@ -0,0 +1,80 @@
+import asyncio
+import datetime
+from collections import Counter
+from handlers.admin import build_sessions, SLOTS_PER_SESSION
+from services import booking
+from services.db import doctor_availability, appointments
+
+DOCTOR_ID = 1
+HOSPITAL = "Abet Hospital"
+PATIENT_INFO = {"name": "Test Patient", "age": "30", "sex": "Female", "reason": "Checkup", "phone": "+251911000000"}
+
+
+async def create_schedule():
+    date = datetime.date.today() + datetime.timedelta(days=3)
+    result = await doctor_availability.insert_one({
+        "doctorId": DOCTOR_ID,
+        "hospital": HOSPITAL,
+        "date": str(date),
+        "sessions": build_sessions(date, "Both"),
+    })
+    return result.inserted_id, str(date)
+
+
+async def assert_consistent(schedule_id):
+    """Counters match the slots, every booked slot has exactly one appointment and no patient holds two slots."""
+    doc = await doctor_availability.find_one({"_id": schedule_id})
+    booked = []
+    for session in doc["sessions"].values():
+        assert session["availableCount"] == sum(1 for s in session["slots"] if s["available"])
+        for slot in session["slots"]:
+            assert slot["available"] == (slot["patientId"] is None)
+            if slot["patientId"] is not None:
+                booked.append(slot["patientId"])
+    assert max(Counter(booked).values(), default=1) == 1
+    assert await appointments.count_documents({"scheduleId": schedule_id}) == len(booked)
+    return booked
+
+
+def test_concurrent_bookings_never_share_a_slot(mongo_run):
+    async def scenario():
+        schedule_id, date = await create_schedule()
+        patients = range(1000, 1300)
+        times = await asyncio.gather(*(
+            booking.book_slot(DOCTOR_ID, HOSPITAL, date, "morning", p, PATIENT_INFO) for p in patients
+        ))
+
+        winners = {p: t for p, t in zip(patients, times) if t}
+        assert len(winners) == SLOTS_PER_SESSION
+        assert len(set(winners.values())) == SLOTS_PER_SESSION
+        assert sorted(await assert_consistent(schedule_id)) == sorted(winners)
+
+    mongo_run(scenario)
+
+
+def test_concurrent_cancellations_and_rebookings_stay_consistent(mongo_run):
+    async def scenario():
+        schedule_id, date = await create_schedule()
+        first = range(1000, 1000 + SLOTS_PER_SESSION)
+        times = await asyncio.gather(*(
+            booking.book_slot(DOCTOR_ID, HOSPITAL, date, "morning", p, PATIENT_INFO) for p in first
+        ))
+        cancelling = dict(zip(first, times[:5]))
+
+        # Every cancellation is sent twice, racing 200 new patients for the freed slots.
+        releases = [booking.release_slot(schedule_id, "morning", t, p) for p, t in cancelling.items() for _ in range(2)]
+        rebookings = [booking.book_slot(DOCTOR_ID, HOSPITAL, date, "morning", p, PATIENT_INFO) for p in range(2000, 2200)]
+        results = await asyncio.gather(*releases, *rebookings)
+
+        released = results[:len(releases)]
+        assert [released[i] or released[i + 1] for i in range(0, len(released), 2)] == [True] * len(cancelling)
+        assert released.count(True) == len(cancelling)
+
+        rebooked = [t for t in results[len(releases):] if t]
+        assert len(rebooked) <= len(cancelling)
+
+        booked = await assert_consistent(schedule_id)
+        assert not set(booked) & set(cancelling)
+        assert len(booked) == SLOTS_PER_SESSION - len(cancelling) + len(rebooked)
+
+    mongo_run(scenario)
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from telegram import Update
+from handlers.patient import (
+    register_patient_handler, NAME, AGE, SEX, REASON, PHONE, HOSPITAL, SELECT_DAY, SELECT_SESSION, CONFIRM_CANCEL,
+)
+from scripts.fake_telegram import message_update
+
+USER_ID = 5151
+DETAILS = {"name": "Test Patient", "age": "30", "sex": "Female", "reason": "Checkup", "phone": "+251911000000"}
+
+
+def conversation(app, name):
+    return next(h for h in app.handlers[0] if getattr(h, "name", None) == name)
+
+
+async def send_in_state(app, name, state, text, user_data=None):
+    """Put USER_ID's `name` conversation in `state`, send `text` and return the state it ends in."""
+    conversation(app, name)._conversations[(USER_ID, USER_ID)] = state
+    app.user_data[USER_ID].update(user_data or {})
+    await app.process_update(Update.de_json(message_update(USER_ID, text), app.bot))
+    return conversation(app, name)._conversations.get((USER_ID, USER_ID))
+
+
+@pytest.mark.parametrize("state, text, reply", [
+    (NAME, "   ", "❌ Please enter your full name."),
+    (AGE, "thirty", "❌ Please enter your age as a number, e.g. 34."),
+    (AGE, "130", "❌ Please enter your age as a number, e.g. 34."),
+    (SEX, "unknown", "❌ Please choose one of the options."),
+    (REASON, "x" * 201, "❌ Please describe the reason in a few words."),
+    (PHONE, "call me", "❌ That doesn't look like a phone number. Please enter it like 0911234567."),
+    (HOSPITAL, "Black Lion Hospital", "❌ Please choose a hospital from the list:"),
+])
+def test_invalid_answers_are_reprompted_without_touching_the_database(bot_app, doctors, state, text, reply):
+    async def scenario():
+        app = await bot_app(register_patient_handler)
+        assert await send_in_state(app, "booking", state, text, DETAILS) == state
+        assert app.bot.texts[USER_ID] == reply
+        await app.shutdown()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("name, state", [
+    ("booking", SELECT_DAY),
+    ("booking", SELECT_SESSION),
+    ("cancel_appointment", CONFIRM_CANCEL),
+])
+def test_typing_in_a_button_step_reprompts_and_keeps_the_state(bot_app, name, state):
+    async def scenario():
+        app = await bot_app(register_patient_handler)
+        assert await send_in_state(app, name, state, "tomorrow please") == state
+        assert app.bot.texts[USER_ID] == "👆 Please tap one of the buttons above, or type /cancel to stop."
+        await app.shutdown()
+
+    asyncio.run(scenario())
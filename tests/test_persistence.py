@@ -0,0 +1,67 @@
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+from handlers.patient import register_patient_handler, AGE, SEX, REASON
+from services.persistence import MongoPersistence
+from scripts.fake_telegram import FakeBot, message_update
+
+USER_ID = 4242
+
+
+async def worker(**kwargs):
+    persistence = MongoPersistence(shared=True, **kwargs)
+    app = ApplicationBuilder().bot(FakeBot("1:test")).persistence(persistence).build()
+    register_patient_handler(app)
+    await app.initialize()
+    return app, persistence
+
+
+async def handle(app, persistence, text, write_through=True):
+    """What bot.process_update does with one update."""
+    update = Update.de_json(message_update(USER_ID, text), app.bot)
+    await persistence.refresh(update, app)
+    await app.process_update(update)
+    if write_through:
+        await persistence.write_through(app)
+
+
+def booking_state(app):
+    conversation = next(h for h in app.handlers[0] if getattr(h, "name", None) == "booking")
+    return conversation._conversations.get((USER_ID, USER_ID))
+
+
+def test_shared_workers_continue_each_others_conversations(mongo_run):
+    async def scenario():
+        (first, first_persistence), (second, second_persistence) = await worker(), await worker()
+
+        await handle(first, first_persistence, "/start")
+        await handle(second, second_persistence, "Shared Patient")
+        assert booking_state(second) == AGE
+
+        await handle(first, first_persistence, "30")
+        assert booking_state(first) == SEX
+        assert first.user_data[USER_ID] == {"name": "Shared Patient", "age": "30"}
+
+        for app in (first, second):
+            await app.shutdown()
+
+    mongo_run(scenario)
+
+
+def test_refresh_keeps_changes_not_yet_written(mongo_run):
+    async def scenario():
+        # Default timings: nothing reaches Mongo between these updates.
+        app, persistence = await worker()
+
+        for text in ["/start", "Abebe", "30", "Female"]:
+            await handle(app, persistence, text, write_through=False)
+        assert booking_state(app) == REASON
+        assert app.user_data[USER_ID] == {"name": "Abebe", "age": "30", "sex": "Female"}
+
+        # The same holds once PTB has handed the changes over but the buffer has not flushed yet.
+        await app.update_persistence()
+        await handle(app, persistence, "Checkup", write_through=False)
+        assert app.user_data[USER_ID]["reason"] == "Checkup"
+
+        await app.shutdown()
+
+    mongo_run(scenario)
@@ -0,0 +1,37 @@
+import asyncio
+import datetime
+from services import reminders
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs):
+        self.docs.extend(docs)
+
+
+def test_reminders_are_due_relative_to_clinic_time_in_utc(monkeypatch):
+    collection = RecordingCollection()
+    monkeypatch.setattr(reminders, "reminders", collection)
+    monkeypatch.setattr(reminders, "CLINIC_TZ", reminders.ZoneInfo("Africa/Addis_Ababa"))
+
+    asyncio.run(reminders.schedule_reminders("appt", "schedule", 7, "Abet Hospital", "2030-01-10", "08:30"))
+
+    # 08:30 in Addis Ababa (UTC+3) is 05:30 UTC.
+    assert [doc["dueAt"] for doc in collection.docs] == [
+        datetime.datetime(2030, 1, 9, 5, 30),
+        datetime.datetime(2030, 1, 10, 4, 30),
+    ]
+
+
+def test_reminders_already_past_are_skipped(monkeypatch):
+    collection = RecordingCollection()
+    monkeypatch.setattr(reminders, "reminders", collection)
+    soon = datetime.datetime.now(reminders.CLINIC_TZ) + datetime.timedelta(hours=3)
+
+    asyncio.run(reminders.schedule_reminders("appt", "schedule", 7, "Abet Hospital",
+                                             soon.strftime("%Y-%m-%d"), soon.strftime("%H:%M")))
+
+    assert len(collection.docs) == 1
+    assert collection.docs[0]["dueAt"] > datetime.datetime.utcnow()
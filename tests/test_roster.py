@@ -0,0 +1,47 @@
+import asyncio
+import csv
+import io
+from services import roster
+
+
+class StubPatients:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queried = []
+
+    def find(self, query, projection=None):
+        self.queried.extend(query["_id"]["$in"])
+        return self._cursor([doc for doc in self.docs if doc["_id"] in query["_id"]["$in"]])
+
+    async def _cursor(self, docs):
+        for doc in docs:
+            yield doc
+
+
+def test_each_appointment_keeps_the_details_given_for_that_visit(monkeypatch):
+    stub = StubPatients([{"_id": 7, "name": "Legacy Name", "phone": "+251911000000"}])
+    monkeypatch.setattr(roster, "patients", stub)
+    batch = [
+        {"patientId": 7, "patient": {"name": "Mother", "age": "61", "reason": "Checkup"}},
+        {"patientId": 7, "patient": {"name": "Son", "age": "9", "reason": "Fever"}},
+        {"patientId": 7},
+    ]
+
+    details = asyncio.run(roster.patient_details(batch))
+
+    assert [d["name"] for d in details] == ["Mother", "Son", "Legacy Name"]
+    assert stub.queried == [7]
+
+
+def test_patient_text_cannot_run_as_a_spreadsheet_formula(monkeypatch):
+    monkeypatch.setattr(roster, "patients", StubPatients([]))
+    appt = {"date": "2026-10-20", "hospital": "Abet Hospital", "session": "morning", "time": "09:00", "patientId": 7,
+            "patient": {"name": "=HYPERLINK(\"http://x\")", "age": "30", "sex": "Male",
+                        "phone": "+251911000000", "reason": "-2+3"}}
+    out = io.StringIO()
+
+    asyncio.run(roster._write_batch(csv.writer(out), [appt]))
+
+    row = next(csv.reader(io.StringIO(out.getvalue())))
+    assert row[4] == "'=HYPERLINK(\"http://x\")"
+    assert row[7:] == ["+251911000000", "'-2+3"]
@@ -0,0 +1,36 @@
+import asyncio
+from telegram.error import NetworkError, RetryAfter
+from services.scheduler import Notifier
+
+
+class FailingBot:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def send_message(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+def send_once(error, monkeypatch):
+    async def no_wait(delay):
+        pass
+
+    notifier = Notifier(global_rate=1000, per_chat_interval=0, max_retries=3)
+    notifier.bot = FailingBot(error)
+    monkeypatch.setattr("services.scheduler.asyncio.sleep", no_wait)
+    message = {"chat_id": 1, "text": "hi", "kwargs": {}, "attempts": 0}
+    return asyncio.run(notifier._send(message)), message, notifier.bot
+
+
+def test_repeated_retry_after_gives_up_after_max_retries(monkeypatch):
+    (status, _), message, bot = send_once(RetryAfter(30), monkeypatch)
+    assert status == "failed"
+    assert message["attempts"] == bot.calls == 3
+
+
+def test_transient_errors_give_up_after_max_retries(monkeypatch):
+    (status, error), message, bot = send_once(NetworkError("boom"), monkeypatch)
+    assert (status, error) == ("failed", "boom")
+    assert message["attempts"] == bot.calls == 3
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import httpx
+import pytest
+
+os.environ.setdefault("BOT_TOKEN", "1:test")
+import bot  # noqa: E402
+
+
+@pytest.fixture
+def get_stats(monkeypatch):
+    async def utilization(start, end, doctor_id):
+        return [{"doctorId": doctor_id}]
+    monkeypatch.setattr(bot.stats, "utilization", utilization)
+
+    def get(headers=None):
+        async def request():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=bot.app), base_url="http://bot") as client:
+                return await client.get("/stats", params={"doctorId": 9001}, headers=headers or {})
+        return asyncio.run(request())
+
+    return get
+
+
+def test_stats_is_disabled_without_a_configured_token(get_stats, monkeypatch):
+    monkeypatch.setattr(bot, "STATS_TOKEN", None)
+    assert get_stats({"X-Stats-Token": "anything"}).status_code == 404
+
+
+def test_stats_requires_the_shared_token(get_stats, monkeypatch):
+    monkeypatch.setattr(bot, "STATS_TOKEN", "s3cret")
+    assert get_stats().status_code == 401
+    assert get_stats({"X-Stats-Token": "wrong"}).status_code == 401
+
+    response = get_stats({"X-Stats-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.json()["rows"] == [{"doctorId": 9001}]
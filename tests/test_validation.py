@@ -0,0 +1,71 @@
+import pytest
+from handlers.validation import (
+    normalize_text, normalize_age, normalize_phone, normalize_sex, normalize_day, normalize_session, normalize_hospital,
+    MAX_TEXT_LENGTH,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("0911234567", "+251911234567"),
+    ("0711234567", "+251711234567"),
+    ("+251 911 234 567", "+251911234567"),
+    ("251-911-234-567", "+251911234567"),
+    ("(0911) 23.45.67", "+251911234567"),
+    ("+44 20 7946 0958", "+442079460958"),
+    ("0811234567", None),
+    ("091123456", None),
+    ("+0911234567", None),
+    ("call me", None),
+    ("", None),
+])
+def test_normalize_phone(text, expected):
+    assert normalize_phone(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("34", "34"), (" 7 ", "7"), ("007", "7"), ("0", "0"), ("120", "120"),
+    ("121", None), ("1000", None), ("-3", None), ("34.5", None), ("thirty", None), ("", None),
+])
+def test_normalize_age(text, expected):
+    assert normalize_age(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Monday", "Monday"), ("  wednesday ", "Wednesday"), ("FRI", "Friday"), ("sun", "Sunday"),
+    ("Mo", None), ("Funday", None), ("", None),
+])
+def test_normalize_day(text, expected):
+    assert normalize_day(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Morning", "Morning"), ("afternoon", "Afternoon"), (" BOTH ", "Both"), ("evening", None), ("", None),
+])
+def test_normalize_session(text, expected):
+    assert normalize_session(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Female", "Female"), ("male", "Male"), ("M", "Male"), ("f", "Female"), ("o", "Other"), ("x", None), ("", None),
+])
+def test_normalize_sex(text, expected):
+    assert normalize_sex(text) == expected
+
+
+def test_normalize_text_trims_and_rejects_empty_or_long_input():
+    assert normalize_text("  Abebe   Kebede ") == "Abebe Kebede"
+    assert normalize_text("   ") is None
+    assert normalize_text("x" * MAX_TEXT_LENGTH) == "x" * MAX_TEXT_LENGTH
+    assert normalize_text("x" * (MAX_TEXT_LENGTH + 1)) is None
+
+
+@pytest.mark.parametrize("text, doctor_id, expected", [
+    ("Abet Hospital", None, "Abet Hospital"),
+    ("  abet   HOSPITAL ", None, "Abet Hospital"),
+    ("Ethio Tebib Hospital", 9002, "Ethio Tebib Hospital"),
+    ("Ethio Tebib Hospital", 9001, None),
+    ("Black Lion Hospital", None, None),
+    ("", None, None),
+])
+def test_normalize_hospital(doctors, text, doctor_id, expected):
+    assert normalize_hospital(text, doctor_id) == expected
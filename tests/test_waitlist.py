@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import pytest
+from bson import ObjectId
+from services import waitlist
+
+PATIENT_ID = 77
+SCHEDULE_ID = ObjectId()
+
+
+class StubWaitlist:
+    def __init__(self, entry):
+        self.entry = entry
+
+    async def find_one_and_update(self, query, update):
+        if self.entry["status"] != query["status"]:
+            return None
+        before = dict(self.entry)
+        self.entry.update(update["$set"])
+        return before
+
+    async def update_one(self, query, update):
+        self.entry.update(update["$set"])
+
+
+class StubAvailability:
+    def __init__(self):
+        self.claimed = 0
+
+    async def update_one(self, query, update, array_filters):
+        self.claimed += 1
+
+        class Result:
+            modified_count = 1
+        return Result()
+
+
+@pytest.fixture
+def offer(monkeypatch):
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    entry = {
+        "_id": ObjectId(), "patientId": PATIENT_ID, "status": "offered", "hospital": "Abet Hospital",
+        "doctorId": 1, "scheduleId": SCHEDULE_ID, "date": str(date), "session": "morning", "time": "09:00",
+        "holdUntil": datetime.datetime.utcnow() + datetime.timedelta(minutes=5), "patient": {"name": "Waiting Patient"},
+    }
+    calls = {"released": [], "offered": [], "recorded": []}
+
+    async def release_hold(held):
+        calls["released"].append(held["_id"])
+
+    async def offer_freed_slots(schedule_id):
+        calls["offered"].append(schedule_id)
+
+    async def record_appointment(*args):
+        calls["recorded"].append(args)
+
+    monkeypatch.setattr(waitlist, "waitlist", StubWaitlist(entry))
+    monkeypatch.setattr(waitlist, "doctor_availability", StubAvailability())
+    monkeypatch.setattr(waitlist, "_release_hold", release_hold)
+    monkeypatch.setattr(waitlist, "offer_freed_slots", offer_freed_slots)
+    monkeypatch.setattr(waitlist, "record_appointment", record_appointment)
+    return entry, calls
+
+
+def booked_this_week(monkeypatch, appointment):
+    async def find_week_appointment(patient_id, date):
+        return appointment
+    monkeypatch.setattr(waitlist, "find_week_appointment", find_week_appointment)
+
+
+def test_accept_books_the_held_slot(offer, monkeypatch):
+    entry, calls = offer
+    booked_this_week(monkeypatch, None)
+
+    assert asyncio.run(waitlist.accept(str(entry["_id"]), PATIENT_ID))["time"] == "09:00"
+    assert entry["status"] == "booked"
+    assert waitlist.doctor_availability.claimed == 1
+    assert len(calls["recorded"]) == 1 and not calls["released"]
+
+
+def test_accept_passes_the_slot_on_when_the_patient_booked_that_week_meanwhile(offer, monkeypatch):
+    entry, calls = offer
+    booked_this_week(monkeypatch, {"patientId": PATIENT_ID, "date": entry["date"]})
+
+    assert asyncio.run(waitlist.accept(str(entry["_id"]), PATIENT_ID)) is None
+    assert entry["status"] == "closed"
+    assert waitlist.doctor_availability.claimed == 0
+    assert not calls["recorded"]
+    assert calls["released"] == [entry["_id"]] and calls["offered"] == [SCHEDULE_ID]
+
+
+class StubEntries:
+    """Waitlist entries matched on status and an optional `$lte` timestamp, as expire_holds queries them."""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    async def find_one_and_update(self, query, update):
+        for entry in self.entries:
+            stamp = next((field for field in ("holdUntil", "claimedAt") if field in query), None)
+            if entry["status"] == query["status"] and (not stamp or entry.get(stamp, datetime.datetime.max) <= query[stamp]["$lte"]):
+                before = dict(entry)
+                entry.update(update["$set"])
+                for field in update.get("$unset", {}):
+                    entry.pop(field, None)
+                return before
+        return None
+
+
+def test_expire_holds_puts_stale_offering_entries_back_on_the_waitlist(monkeypatch):
+    now = datetime.datetime.utcnow()
+    stale = {"_id": ObjectId(), "patientId": 1, "status": "offering", "scheduleId": SCHEDULE_ID,
+             "claimedAt": now - waitlist.OFFERING_TIMEOUT - datetime.timedelta(seconds=1)}
+    in_progress = {"_id": ObjectId(), "patientId": 2, "status": "offering", "scheduleId": SCHEDULE_ID, "claimedAt": now}
+    released, offered = [], []
+
+    async def release_any_hold(schedule_id, patient_id):
+        released.append((schedule_id, patient_id))
+
+    async def offer_freed_slots(schedule_id):
+        offered.append(schedule_id)
+
+    monkeypatch.setattr(waitlist, "waitlist", StubEntries([stale, in_progress]))
+    monkeypatch.setattr(waitlist, "_release_any_hold", release_any_hold)
+    monkeypatch.setattr(waitlist, "offer_freed_slots", offer_freed_slots)
+
+    asyncio.run(waitlist.expire_holds())
+
+    assert stale["status"] == "waiting" and "claimedAt" not in stale and "scheduleId" not in stale
+    assert in_progress["status"] == "offering"
+    assert released == [(SCHEDULE_ID, 1)] and offered == [SCHEDULE_ID]